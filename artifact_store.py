@@ -0,0 +1,210 @@
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+
+STORE_DIR = os.path.join("result", "store")
+GC_GRACE_SECONDS = 3600   # gc() leaves younger blobs alone: put() may not have indexed them yet
+RESULT_NAME_PATTERN = re.compile(r"^(?P<model>.+)_(?P<date>\d{4}-\d{2}-\d{2})(?P<raw>_RawOutput|_raw_output)?\.(?P<kind>ly|midi|pdf)$")
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for result files.
+
+    Every file is stored once as a zlib-compressed blob named by the SHA-256
+    of its content (objects/ab/cdef...), however many runs produced it. A
+    SQLite index maps (model, date, variant, kind) to the blob, e.g.
+    ("openai/o3-mini", "2025-06-01", "raw", "ly"). Lookups and listings are
+    index queries, so they stay fast with hundreds of thousands of entries;
+    unreferenced blobs are removed by gc().
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " model TEXT NOT NULL, date TEXT NOT NULL, variant TEXT NOT NULL, kind TEXT NOT NULL,"
+            " hash TEXT NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL,"
+            " PRIMARY KEY (model, date, variant, kind))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_hash ON artifacts (hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_date ON artifacts (date)")
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def put_blob(self, data):
+        """Store bytes (once) and return their SHA-256 hex digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        try:
+            os.utime(path)  # already stored: make it young again so a concurrent gc() keeps it
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp_path, path)  # atomic: readers never see half a blob
+        return digest
+
+    def get_blob(self, digest):
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def put(self, model, date, variant, kind, data):
+        """Store one artifact and point (model, date, variant, kind) at it. Returns the hash."""
+        digest = self.put_blob(data)
+        self._db.execute(
+            "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (model, date, variant, kind, digest, len(data), time.time()),
+        )
+        self._db.commit()
+        return digest
+
+    def store_file(self, path, model, date, variant, kind=None):
+        """Store a file from disk; kind defaults to its extension (ly, midi, pdf)."""
+        if kind is None:
+            kind = os.path.splitext(path)[1].lstrip(".")
+        with open(path, "rb") as f:
+            return self.put(model, date, variant, kind, f.read())
+
+    def lookup(self, model, date, variant, kind):
+        """Hash of an artifact, or None."""
+        row = self._db.execute(
+            "SELECT hash FROM artifacts WHERE model = ? AND date = ? AND variant = ? AND kind = ?",
+            (model, date, variant, kind),
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, model, date, variant, kind):
+        """Content of an artifact, or None if it is not in the index."""
+        digest = self.lookup(model, date, variant, kind)
+        return self.get_blob(digest) if digest else None
+
+    def export(self, model, date, variant, kind, output_path):
+        """Write an artifact back out as a normal file. Returns False if it does not exist."""
+        data = self.get(model, date, variant, kind)
+        if data is None:
+            return False
+        with open(output_path, "wb") as f:
+            f.write(data)
+        return True
+
+    def list(self, model=None, date=None, variant=None, kind=None, limit=None):
+        """
+        Index entries matching the given fields, newest date first, as
+        (model, date, variant, kind, hash, size) tuples.
+        """
+        conditions, params = [], []
+        for column, value in (("model", model), ("date", date), ("variant", variant), ("kind", kind)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        query = "SELECT model, date, variant, kind, hash, size FROM artifacts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY date DESC, model, variant, kind"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._db.execute(query, params).fetchall()
+
+    def remove(self, model, date, variant, kind=None):
+        """Drop index entries (all kinds if kind is None); blobs go at the next gc()."""
+        query = "DELETE FROM artifacts WHERE model = ? AND date = ? AND variant = ?"
+        params = [model, date, variant]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        removed = self._db.execute(query, params).rowcount
+        self._db.commit()
+        return removed
+
+    def gc(self, grace_seconds=GC_GRACE_SECONDS):
+        """
+        Delete blobs no index entry points to.
+
+        Blobs written or reused in the last `grace_seconds` and temporary
+        files of writes in progress are kept, so gc() can run while other
+        processes are storing results.
+
+        Returns:
+            Tuple (blobs_removed, bytes_freed).
+        """
+        referenced = {row[0] for row in self._db.execute("SELECT DISTINCT hash FROM artifacts")}
+        cutoff = time.time() - grace_seconds
+        removed = freed = 0
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if prefix + name in referenced or name.startswith("tmp"):
+                    continue
+                path = os.path.join(prefix_dir, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                freed += stat.st_size
+                removed += 1
+        return removed, freed
+
+    def stats(self):
+        entries, logical = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        blobs = self._db.execute("SELECT COUNT(DISTINCT hash) FROM artifacts").fetchone()[0]
+        return {"entries": entries, "unique_blobs": blobs, "logical_bytes": logical}
+
+
+def import_results(result_dir="result", store=None):
+    """
+    Put the existing flat result files (<model>_<date>[_RawOutput].<ly|midi|pdf>)
+    into the store. The model name keeps the filename form ('/' and ':'
+    were replaced by '_' when the files were written).
+
+    Returns:
+        Number of files imported.
+    """
+    store = ArtifactStore() if store is None else store
+    imported = 0
+    for name in sorted(os.listdir(result_dir)):
+        match = RESULT_NAME_PATTERN.match(name)
+        if not match:
+            continue
+        variant = "raw" if match.group("raw") else "checked"
+        try:
+            store.store_file(os.path.join(result_dir, name), match.group("model"), match.group("date"),
+                             variant, match.group("kind"))
+            imported += 1
+        except OSError as e:
+            print(f"Warning: could not import {name}: {e}", file=sys.stderr)
+    return imported
+
+
+if __name__ == "__main__":
+    with ArtifactStore() as store:
+        print(f"Imported {import_results(store=store)} files")
+        print(store.stats())
+        print("Garbage collected:", store.gc())
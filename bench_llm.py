@@ -0,0 +1,117 @@
+import argparse
+import contextlib
+import io
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# get_melody refuses to import without a key; the stub does not check it.
+os.environ.setdefault("OPEN_API", "stub-key")
+
+import llm_client
+from get_melody import send_to_llm, send_batch_to_llm
+from stub_server import StubConfig, start_stub_server
+
+CONTERPOINT = r"'CantusFirmus': [60, 62, 65, 64, 65, 67, 69, 67, 64, 62, 60]"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_single(base_url, exercises, concurrency, max_attempts):
+    """Drive send_to_llm once per exercise; returns [(accepted, latency)]."""
+    def one(_):
+        started = time.monotonic()
+        result, _midi = send_to_llm(CONTERPOINT, max_attempts=max_attempts, use_checking=True,
+                                    model="stub", base_url=base_url)
+        return result == "Successful Output", time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(one, range(exercises)))
+
+
+def run_batch(base_url, exercises, concurrency, max_attempts, batch_size):
+    """Drive send_batch_to_llm over the campaign; latency is per batch call."""
+    ids = [f"cf{i}" for i in range(exercises)]
+    chunks = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+    def one(chunk):
+        started = time.monotonic()
+        results = send_batch_to_llm({exercise_id: CONTERPOINT for exercise_id in chunk},
+                                    batch_size=batch_size, max_attempts=max_attempts,
+                                    model="stub", base_url=base_url)
+        latency = time.monotonic() - started
+        return [(result == "Successful Output", latency) for result, _midi in results.values()]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return [item for chunk in executor.map(one, chunks) for item in chunk]
+
+
+def run_benchmark(exercises=50, concurrency=8, max_attempts=5, mode="single", batch_size=5,
+                  config=None, quiet=True):
+    """
+    Run the generation loop against a local stub server and report throughput.
+
+    Returns a dictionary with accepted melodies per second, p50/p99 latency of
+    accepted melodies, attempts (HTTP requests) per success and the
+    llm_client metrics snapshot.
+    """
+    server, base_url = start_stub_server(config=config)
+    llm_client.METRICS.reset()
+    llm_client.configure_budget()
+    try:
+        output = io.StringIO() if quiet else None
+        started = time.monotonic()
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            if mode == "batch":
+                outcomes = run_batch(base_url, exercises, concurrency, max_attempts, batch_size)
+            else:
+                outcomes = run_single(base_url, exercises, concurrency, max_attempts)
+        elapsed = time.monotonic() - started
+    finally:
+        server.shutdown()
+
+    accepted_latencies = [latency for accepted, latency in outcomes if accepted]
+    metrics = llm_client.METRICS.snapshot()
+    accepted = len(accepted_latencies)
+    p50 = percentile(accepted_latencies, 50)
+    p99 = percentile(accepted_latencies, 99)
+    return {
+        "mode": mode,
+        "exercises": exercises,
+        "accepted": accepted,
+        "elapsed_seconds": round(elapsed, 3),
+        "accepted_per_second": round(accepted / elapsed, 2) if elapsed else None,
+        "p50_latency": round(p50, 3) if p50 is not None else None,
+        "p99_latency": round(p99, 3) if p99 is not None else None,
+        "attempts_per_success": round(metrics["requests"] / accepted, 2) if accepted else None,
+        "metrics": metrics,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load benchmark of the generation loop against a local stub.")
+    parser.add_argument("--exercises", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--mode", choices=["single", "batch"], default="single")
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--script", default="invalid,valid,malformed,valid")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = StubConfig(latency=args.latency, error_rate=args.error_rate, script=args.script.split(","))
+    report = run_benchmark(exercises=args.exercises, concurrency=args.concurrency,
+                           max_attempts=args.max_attempts, mode=args.mode,
+                           batch_size=args.batch_size, config=config, quiet=not args.verbose)
+    for name, value in report.items():
+        print(f"{name}: {value}")
@@ -0,0 +1,152 @@
+import collections
+import hashlib
+import json
+import operator
+import os
+import struct
+import sys
+import threading
+
+from checking import RULES, RULE_VERSIONS, run_rule
+
+MAX_ENTRIES = 100000
+CACHE_FILE = os.path.join("result", "check_cache.json")
+
+
+def content_hash(inputCounterpoint, inputCantusFirmus, key_root=60, is_minor=False):
+    """
+    Compact hash of one exercise: 16-byte BLAKE2b over the notes of both
+    voices and the key. Rests are encoded as -1, so they never collide
+    with a MIDI note. A voice with non-integer notes (e.g. 60.5 from an
+    LLM) is hashed by its repr instead, so it never shares a hash with
+    the rounded melody.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for notes in (inputCounterpoint, inputCantusFirmus):
+        try:
+            packed = struct.pack(f"<I{len(notes)}i", len(notes),
+                                 *(-1 if note is None else operator.index(note) for note in notes))
+        except (TypeError, struct.error):
+            packed = b"repr:" + repr(list(notes)).encode()
+        digest.update(packed)
+    digest.update(struct.pack("<h?", key_root, bool(is_minor)))
+    return digest.hexdigest()
+
+
+class CheckCache:
+    """
+    Bounded LRU of rule verdicts keyed by (rule, rule version, content hash).
+
+    Each rule's verdict is stored separately, so bumping one entry in
+    checking.RULE_VERSIONS only invalidates that rule's results. Thread safe.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, rule_name, digest):
+        """Return (found, report) for a rule's verdict on the current rule version."""
+        key = (rule_name, RULE_VERSIONS[rule_name], digest)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, rule_name, digest, report):
+        key = (rule_name, RULE_VERSIONS[rule_name], digest)
+        with self._lock:
+            self._entries[key] = report
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_rule(self, rule_name):
+        """Drop every cached verdict of one rule (any version). Returns how many were removed."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == rule_name]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def prune_stale(self):
+        """Drop verdicts whose rule version no longer matches checking.RULE_VERSIONS."""
+        with self._lock:
+            stale = [key for key in self._entries if RULE_VERSIONS.get(key[0]) != key[1]]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+    def save(self, path=CACHE_FILE):
+        """Write the cache (least recently used first) as JSON."""
+        with self._lock:
+            entries = [[rule, version, digest, report] for (rule, version, digest), report in self._entries.items()]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"entries": entries}, f)
+
+    @classmethod
+    def load(cls, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        """Load a saved cache, skipping verdicts of outdated rule versions."""
+        cache = cls(max_entries=max_entries)
+        if not os.path.exists(path):
+            return cache
+        try:
+            with open(path) as f:
+                entries = json.load(f)["entries"]
+        except (json.JSONDecodeError, OSError, KeyError) as e:
+            print(f"Warning: could not read check cache from {path}: {e}", file=sys.stderr)
+            return cache
+        for rule, version, digest, report in entries:
+            if RULE_VERSIONS.get(rule) == version:
+                cache.put(rule, digest, report)
+        return cache
+
+
+DEFAULT_CACHE = CheckCache()
+
+
+def cached_run_all_checks(inputCounterpoint, inputCantusFirmus, key_root=60, is_minor=False, cache=None):
+    """
+    Same result as checking.run_all_checks, but rules whose verdict on this
+    exact exercise is already cached are not run again.
+    """
+    cache = DEFAULT_CACHE if cache is None else cache
+    digest = content_hash(inputCounterpoint, inputCantusFirmus, key_root, is_minor)
+    findings = []
+    for rule_name, _, _ in RULES:
+        found, report = cache.get(rule_name, digest)
+        if not found:
+            report = run_rule(rule_name, inputCounterpoint, inputCantusFirmus, key_root, is_minor)
+            cache.put(rule_name, digest, report)
+        if report is not None:
+            findings.append((rule_name, report))
+    return findings
@@ -0,0 +1,240 @@
+import argparse
+import collections
+import json
+import math
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Only checking.py is imported: no API key, no network, no LLM client.
+from checking import run_all_checks_batch
+
+MAX_BATCH = 64          # items evaluated together
+MAX_WAIT = 0.002        # seconds the batcher waits to fill a batch
+MAX_QUEUE = 4096        # pending items before requests are refused (HTTP 503)
+REQUEST_TIMEOUT = 10.0  # seconds a request waits for its result
+
+
+class _Pending:
+    __slots__ = ("item", "done", "result", "enqueued_at")
+
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        self.result = None
+        self.enqueued_at = time.monotonic()
+
+
+class CheckBatcher:
+    """
+    Collects check requests from many threads into micro-batches.
+
+    A single worker thread takes the first waiting item, keeps collecting
+    for up to `max_wait` seconds or until `max_batch` items, and runs them
+    through checking.run_all_checks_batch. The queue is bounded: `submit`
+    raises queue.Full when `max_queue` items are already waiting, which the
+    HTTP layer turns into a 503 so callers back off.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_queue=MAX_QUEUE, latency_window=10000):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=latency_window)
+        self.started_at = time.monotonic()
+        self.checked = 0
+        self.batches = 0
+        self.rejected = 0
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """Queue one (cp, cf, key_root, is_minor) item; returns a _Pending to wait on."""
+        pending = _Pending(item)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise
+        return pending
+
+    def check(self, items, timeout=REQUEST_TIMEOUT):
+        """Submit items and wait for their findings (raises queue.Full or TimeoutError)."""
+        pendings = [self.submit(item) for item in items]
+        deadline = time.monotonic() + timeout
+        for pending in pendings:
+            if not pending.done.wait(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError("check timed out")
+        return [pending.result for pending in pendings]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                results = run_all_checks_batch([pending.item for pending in batch])
+            except Exception:
+                # Check one by one so a failing item cannot change another client's verdict
+                results = [self._check_one(pending.item) for pending in batch]
+
+            now = time.monotonic()
+            with self._lock:
+                self.batches += 1
+                self.checked += len(batch)
+                self._latencies.extend(now - pending.enqueued_at for pending in batch)
+            for pending, result in zip(batch, results):
+                pending.result = result
+                pending.done.set()
+
+    @staticmethod
+    def _check_one(item):
+        try:
+            return run_all_checks_batch([item])[0]
+        except Exception as e:
+            return [("error", f"checker failed: {e}")]
+
+    def metrics(self):
+        """Throughput, batch size, queue depth and p50/p99 latency (milliseconds)."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            checked, batches, rejected = self.checked, self.batches, self.rejected
+        elapsed = time.monotonic() - self.started_at
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[max(1, math.ceil(p / 100 * len(latencies))) - 1] * 1000, 3)
+
+        return {
+            "checked": checked,
+            "batches": batches,
+            "rejected": rejected,
+            "queue_depth": self._queue.qsize(),
+            "mean_batch_size": round(checked / batches, 2) if batches else None,
+            "checks_per_second": round(checked / elapsed, 1) if elapsed else None,
+            "p50_latency_ms": pct(50),
+            "p99_latency_ms": pct(99),
+        }
+
+
+def _is_note(value):
+    return value is None or (type(value) is int and 0 <= value <= 127)
+
+
+def _parse_item(data):
+    cp = data.get("counterpoint", data.get("Counterpoint"))
+    cf = data.get("cantus_firmus", data.get("CantusFirmus"))
+    if not isinstance(cp, list) or not isinstance(cf, list) or not cp or not cf:
+        raise ValueError("each item needs non-empty 'counterpoint' and 'cantus_firmus' lists")
+    if not all(_is_note(note) for note in cp + cf):
+        raise ValueError("notes must be MIDI numbers 0-127 or null for a rest")
+    if all(note is None for note in cp):
+        raise ValueError("the counterpoint needs at least one note")
+    return cp, cf, int(data.get("key_root", 60)), bool(data.get("is_minor", False))
+
+
+class CheckHandler(BaseHTTPRequestHandler):
+    """
+    POST /check   {"counterpoint": [...], "cantus_firmus": [...], "key_root": 60, "is_minor": false}
+                  or {"items": [ ...same objects... ]}
+    GET  /metrics throughput and latency counters
+    GET  /health
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients do not reconnect per check
+    disable_nagle_algorithm = True  # headers and body are separate writes; avoid the delayed-ACK stall
+    batcher = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, self.batcher.metrics())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/check":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+            single = "items" not in data
+            items = [_parse_item(data)] if single else [_parse_item(item) for item in data["items"]]
+        except (json.JSONDecodeError, ValueError, TypeError, AttributeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            results = self.batcher.check(items)
+        except queue.Full:
+            self._send_json(503, {"error": "checker overloaded"}, {"Retry-After": "1"})
+            return
+        except TimeoutError as e:
+            self._send_json(504, {"error": str(e)})
+            return
+
+        payload = [{"passed": not findings, "findings": [{"rule": rule, "report": report} for rule, report in findings]}
+                   for findings in results]
+        self._send_json(200, payload[0] if single else {"results": payload})
+
+
+class CheckServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog for bursts of new connections
+
+
+def start_check_service(host="127.0.0.1", port=8766, batcher=None):
+    """
+    Start the checking service in a daemon thread.
+
+    Returns:
+        Tuple (server, url); call server.shutdown() to stop it.
+    """
+    handler = type("ConfiguredCheckHandler", (CheckHandler,), {"batcher": batcher or CheckBatcher()})
+    server = CheckServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-lived counterpoint checking service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000)
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    args = parser.parse_args()
+
+    batcher = CheckBatcher(max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000, max_queue=args.max_queue)
+    server, url = start_check_service(args.host, args.port, batcher)
+    print(f"Checking service listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
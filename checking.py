@@ -562,5 +562,104 @@ def analyze_melody_characteristics(inputMelody):
     else:
         return True, "\n".join(findings_list)
 
+# Every rule run on a generated exercise, as (name, function, needs_cantus_firmus).
+# check_key_adherence is handled separately because it takes the key.
+RULES = [
+    ("parallel_perfect_intervals", find_parallel_perfect_intervals, True),
+    ("parallel_motives", find_parallel_motives, True),
+    ("voice_spacing", check_voice_spacing_crossing_overlapping, True),
+    ("dissonant_leaps", find_dissonant_leaps, False),
+    ("repeated_notes", check_repeated_notes, False),
+    ("dissonant_interval", find_dissonant_interval, True),
+    ("octave_unison", check_octave_unison_rules, True),
+    ("key_adherence", check_key_adherence, False),
+    ("melody_characteristics", analyze_melody_characteristics, False),
+]
+
+
+# Bump a rule's version whenever its logic or report text changes, so cached
+# verdicts (see check_cache.py) from the old version are never reused.
+RULE_VERSIONS = {
+    "parallel_perfect_intervals": 1,
+    "parallel_motives": 1,
+    "voice_spacing": 1,
+    "dissonant_leaps": 1,
+    "repeated_notes": 1,
+    "dissonant_interval": 1,
+    "octave_unison": 1,
+    "key_adherence": 1,
+    "melody_characteristics": 1,
+}
+
+
+def run_rule(rule_name, inputCounterpoint, inputCantusFirmus, key_root=60, is_minor=False):
+    """
+    Runs a single rule from RULES by name.
+
+    Returns:
+        The report string if the rule found problems, otherwise None.
+    """
+    for name, func, needs_cantus_firmus in RULES:
+        if name == rule_name:
+            break
+    else:
+        raise KeyError(f"Unknown rule: {rule_name}")
+
+    if func is check_key_adherence:
+        result = func(inputCounterpoint, key_root, is_minor)
+    elif needs_cantus_firmus:
+        result = func(inputCounterpoint, inputCantusFirmus)
+    else:
+        result = func(inputCounterpoint)
+    if isinstance(result, tuple) and result[0]:
+        return result[1]
+    return None
+
+
+def run_all_checks(inputCounterpoint, inputCantusFirmus, key_root=60, is_minor=False):
+    """
+    Runs every rule in RULES on one counterpoint/cantus firmus pair.
+
+    Args:
+        inputCounterpoint: List of MIDI note numbers for the counterpoint melody
+        inputCantusFirmus: List of MIDI note numbers for the cantus firmus melody
+        key_root: MIDI note number of the key root (e.g., 60 for C)
+        is_minor: Boolean indicating if the key is minor (True) or major (False)
+
+    Returns:
+        List of (rule_name, report_string) for every rule that found problems.
+        An empty list means the pair passed all checks.
+    """
+    findings = []
+    for name, _, _ in RULES:
+        report = run_rule(name, inputCounterpoint, inputCantusFirmus, key_root, is_minor)
+        if report is not None:
+            findings.append((name, report))
+    return findings
+
+
+def run_all_checks_batch(items):
+    """
+    Runs run_all_checks on many exercises in one call.
+
+    Identical exercises in the batch (same counterpoint, cantus firmus and
+    key) are checked only once.
+
+    Args:
+        items: List of (inputCounterpoint, inputCantusFirmus, key_root, is_minor) tuples.
+
+    Returns:
+        List of findings lists, in the same order as items.
+    """
+    seen = {}
+    results = []
+    for cp, cf, key_root, is_minor in items:
+        content_key = (tuple(cp), tuple(cf), key_root, bool(is_minor))
+        if content_key not in seen:
+            seen[content_key] = run_all_checks(cp, cf, key_root, is_minor)
+        results.append(seen[content_key])
+    return results
+
+
 if __name__ == "__main__":
     print(analyze_melody_characteristics([72, 69, 74, 72, 69, 71, 72, 71, 67, 69, 72]))
\ No newline at end of file
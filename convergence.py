@@ -0,0 +1,118 @@
+import collections
+
+
+def finding_vector(findings):
+    """
+    Turn run_all_checks output into a Counter {rule_name: number_of_findings}.
+    Each line of a rule's report counts as one finding.
+    """
+    vector = collections.Counter()
+    for rule_name, report in findings:
+        vector[rule_name] += max(1, len(report.strip().splitlines()))
+    return vector
+
+
+class ConvergenceTracker:
+    """
+    Follows the findings of successive send_to_llm attempts and tells the
+    loop when the model has stopped making progress.
+
+    Args:
+        patience: Number of attempts in a row without improvement before
+                  the run counts as stalled.
+        min_improvement: How many findings fewer than the best attempt so
+                         far count as an improvement.
+        on_stall: "stop" to give up when stalled, or "switch" to first try
+                  a different strategy (fresh melody, higher temperature)
+                  and only stop if that stalls as well.
+        patience_after_switch: Attempts without improvement after the
+                  switch before stopping. With the defaults a run that never
+                  improves stops after its 4th of 5 attempts.
+    """
+
+    def __init__(self, patience=2, min_improvement=1, on_stall="switch", patience_after_switch=1):
+        if on_stall not in ("stop", "switch"):
+            raise ValueError(f"on_stall must be 'stop' or 'switch', not {on_stall!r}")
+        self.patience = patience
+        self.patience_after_switch = patience_after_switch
+        self.min_improvement = min_improvement
+        self.on_stall = on_stall
+        self.history = []
+        self.tokens = []
+        self.best_total = None
+        self.stalled_attempts = 0
+        self.switched = False
+        self.stop_reason = None
+
+    def record_tokens(self, total_tokens):
+        """Record the token usage of one request (None if the provider did not report it)."""
+        self.tokens.append(total_tokens or 0)
+
+    def update(self, findings):
+        """
+        Add the findings of one checked attempt.
+
+        Returns:
+            "continue", "switch" (try another strategy) or "stop".
+        """
+        vector = finding_vector(findings)
+        self.history.append(dict(vector))
+        total = sum(vector.values())
+
+        if self.best_total is None or self.best_total - total >= self.min_improvement:
+            self.best_total = total if self.best_total is None else min(self.best_total, total)
+            self.stalled_attempts = 0
+            return "continue"
+
+        self.stalled_attempts += 1
+        if self.stalled_attempts < (self.patience_after_switch if self.switched else self.patience):
+            return "continue"
+
+        if self.on_stall == "switch" and not self.switched:
+            self.switched = True
+            self.stalled_attempts = 0
+            return "switch"
+
+        self.stop_reason = (f"no improvement on {self.best_total} findings "
+                            f"for {self.stalled_attempts} attempts")
+        return "stop"
+
+    def persistent_rules(self, top=3):
+        """Rules that failed most often across the attempts so far."""
+        counts = collections.Counter()
+        for vector in self.history:
+            counts.update(vector.keys())
+        return [rule for rule, _ in counts.most_common(top)]
+
+    def report(self, max_attempts):
+        """
+        Summary of the run: attempts used and saved, tokens used, and an
+        estimate of the tokens saved (average tokens per request times the
+        attempts not spent).
+        """
+        attempts_used = len(self.tokens)
+        attempts_saved = max(0, max_attempts - attempts_used) if self.stop_reason else 0
+        tokens_used = sum(self.tokens)
+        average_tokens = tokens_used / attempts_used if attempts_used else 0
+        return {
+            "attempts_used": attempts_used,
+            "attempts_saved": attempts_saved,
+            "tokens_used": tokens_used,
+            "tokens_saved": int(average_tokens * attempts_saved),
+            "stopped_early": self.stop_reason is not None,
+            "stop_reason": self.stop_reason,
+            "switched_strategy": self.switched,
+            "finding_history": self.history,
+        }
+
+
+def summarize_reports(reports):
+    """Totals over several tracker reports, e.g. for a whole campaign."""
+    return {
+        "runs": len(reports),
+        "stopped_early": sum(1 for r in reports if r["stopped_early"]),
+        "attempts_used": sum(r["attempts_used"] for r in reports),
+        "attempts_saved": sum(r["attempts_saved"] for r in reports),
+        "tokens_used": sum(r["tokens_used"] for r in reports),
+        "tokens_saved": sum(r["tokens_saved"] for r in reports),
+    }
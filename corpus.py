@@ -0,0 +1,333 @@
+import mmap
+import os
+import re
+import struct
+import sys
+
+import numpy as np
+
+from midi_lily import note_to_midi
+
+# --- File layout ---------------------------------------------------------
+# <name>.vpc      header (16 bytes) followed by note rows: one int8 per voice
+#                 per measure (Counterpoint, CantusFirmus), REST for rests.
+# <name>.vpc.idx  offset table: one INDEX_DTYPE record per voice pair giving
+#                 its first row and its length, plus the key.
+# Both files only ever grow, so appending never moves existing data.
+MAGIC = b"VPCORP\x00\x01"
+VERSION = 1
+NUM_VOICES = 2
+REST = -1
+HEADER = struct.Struct("<8sHHb3x")  # magic, version, voices, rest sentinel
+HEADER_SIZE = HEADER.size
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u4"), ("key_root", "i1"), ("is_minor", "u1"), ("_pad", "V2")])
+
+
+def _index_path(path):
+    return path + ".idx"
+
+
+def _to_row_values(notes):
+    values = []
+    for note in notes:
+        if note is None:
+            values.append(REST)
+        elif 0 <= note <= 127:
+            values.append(note)
+        else:
+            raise ValueError(f"MIDI note {note} is outside 0-127")
+    return values
+
+
+def append_pairs(path, pairs):
+    """
+    Append voice pairs to a corpus, creating it if needed.
+
+    Args:
+        path: Corpus file (the offset table is written next to it as path + ".idx").
+        pairs: Iterable of (counterpoint, cantus_firmus) or
+               (counterpoint, cantus_firmus, key_root, is_minor) tuples; rests are None.
+               The shorter voice is padded with rests.
+
+    Returns:
+        Number of pairs appended.
+    """
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, NUM_VOICES, REST))
+        open(_index_path(path), "wb").close()
+
+    with open(path, "r+b") as data_file, open(_index_path(path), "ab") as index_file:
+        _check_header(data_file.read(HEADER_SIZE), path)
+        data_file.seek(0, os.SEEK_END)
+        next_row = (data_file.tell() - HEADER_SIZE) // NUM_VOICES
+
+        appended = 0
+        for pair in pairs:
+            cp, cf = pair[0], pair[1]
+            key_root = pair[2] if len(pair) > 2 else 60
+            is_minor = pair[3] if len(pair) > 3 else False
+            length = max(len(cp), len(cf))
+            rows = np.full((length, NUM_VOICES), REST, dtype=np.int8)
+            rows[:len(cp), 0] = _to_row_values(cp)
+            rows[:len(cf), 1] = _to_row_values(cf)
+            data_file.write(rows.tobytes())
+
+            record = np.zeros(1, dtype=INDEX_DTYPE)
+            record["offset"] = next_row
+            record["length"] = length
+            record["key_root"] = key_root - 60  # stored relative to middle C to fit int8
+            record["is_minor"] = bool(is_minor)
+            index_file.write(record.tobytes())
+
+            next_row += length
+            appended += 1
+    return appended
+
+
+def _check_header(header, path):
+    if len(header) < HEADER_SIZE:
+        raise ValueError(f"{path} is not a voice-pair corpus (file too short)")
+    magic, version, voices, rest = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a voice-pair corpus (bad magic {magic!r})")
+    if version != VERSION or voices != NUM_VOICES or rest != REST:
+        raise ValueError(f"{path} has unsupported layout (version {version}, {voices} voices)")
+
+
+class VoicePairCorpus:
+    """
+    Read-only, memory-mapped view of a corpus written by append_pairs.
+
+    Nothing is parsed or copied on open: `notes` is a (rows, 2) int8 NumPy
+    view straight onto the mapped file and `index` a structured view onto the
+    offset table. `corpus[i]` returns zero-copy (counterpoint, cantus_firmus)
+    int8 views. Pairs appended after opening are seen after `reopen()`.
+
+        with VoicePairCorpus("pairs.vpc") as corpus:
+            for i, findings in corpus.check():
+                ...
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._maps = []
+        self.reopen()
+
+    def _map(self, file_path):
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+    def reopen(self):
+        self.close()
+        data = self._map(self.path)
+        _check_header(data[:HEADER_SIZE], self.path)
+        index = self._map(_index_path(self.path))
+        rows = (len(data) - HEADER_SIZE) // NUM_VOICES
+        self.notes = np.frombuffer(data, dtype=np.int8, count=rows * NUM_VOICES,
+                                   offset=HEADER_SIZE).reshape(rows, NUM_VOICES)
+        self.index = np.frombuffer(index, dtype=INDEX_DTYPE)
+
+    def close(self):
+        self.notes = None
+        self.index = None
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # a caller still holds a view; the map is released with it
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        record = self.index[i]
+        rows = self.notes[record["offset"]:record["offset"] + record["length"]]
+        return rows[:, 0], rows[:, 1]
+
+    def key(self, i):
+        """(key_root, is_minor) of pair i."""
+        record = self.index[i]
+        return int(record["key_root"]) + 60, bool(record["is_minor"])
+
+    def pair_lists(self, i):
+        """Pair i as two Python lists with None for rests, as checking.py expects."""
+        cp, cf = self[i]
+        return ([None if n == REST else n for n in cp.tolist()],
+                [None if n == REST else n for n in cf.tolist()])
+
+    def vertical_intervals(self):
+        """
+        Counterpoint minus cantus firmus for every row of the corpus at once,
+        as an int16 array (rows with a rest are masked out in the returned
+        mask). Useful for corpus-wide scans of vertical rules.
+        """
+        diff = self.notes[:, 0].astype(np.int16) - self.notes[:, 1]
+        valid = (self.notes[:, 0] != REST) & (self.notes[:, 1] != REST)
+        return diff, valid
+
+    def check(self, indices=None):
+        """Yield (i, findings) running checking.run_all_checks on each pair."""
+        from checking import run_all_checks
+
+        for i in range(len(self)) if indices is None else indices:
+            cp, cf = self.pair_lists(i)
+            key_root, is_minor = self.key(i)
+            yield i, run_all_checks(cp, cf, key_root, is_minor)
+
+
+# --- Converters from the existing result/ outputs ------------------------
+
+def read_lilypond_voices(ly_path):
+    """
+    Read the voices of a .ly file written by midi_to_lilypond.
+
+    Returns:
+        Dictionary {voice_name: list of MIDI notes (None for rests)}.
+    """
+    with open(ly_path) as f:
+        content = f.read()
+    voices = {}
+    staff_pattern = r'\\new Staff = "([^"]+)".*?\\fixed c\' \{(.*?)\}'
+    for name, body in re.findall(staff_pattern, content, re.DOTALL):
+        notes = []
+        for token in body.replace("|", " ").split():
+            pitch = re.sub(r"\d+\.*$", "", token)  # strip the duration
+            notes.append(note_to_midi(pitch))
+        voices[name] = notes
+    return voices
+
+
+def _read_varlen(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def read_midi_voices(midi_path):
+    """
+    Read the voices of a .midi file rendered by LilyPond from midi_to_lilypond.
+
+    Every track with notes becomes one voice, named after its track name
+    (LilyPond writes "Counterpoint:"). Notes are placed in whole-note slots;
+    empty slots become rests (None).
+
+    Returns:
+        Dictionary {voice_name: list of MIDI notes}.
+    """
+    with open(midi_path, "rb") as f:
+        data = f.read()
+    if data[:4] != b"MThd":
+        raise ValueError(f"{midi_path} is not a standard MIDI file")
+    header_length = struct.unpack(">I", data[4:8])[0]
+    _format, num_tracks, division = struct.unpack(">HHH", data[8:14])
+    if division & 0x8000:
+        raise ValueError(f"{midi_path} uses SMPTE timing, which is not supported")
+    whole_note = division * 4
+
+    voices = {}
+    pos = 8 + header_length
+    for track_number in range(num_tracks):
+        if data[pos:pos + 4] != b"MTrk":
+            raise ValueError(f"{midi_path}: expected track chunk at byte {pos}")
+        length = struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        track, pos = data[pos + 8:pos + 8 + length], pos + 8 + length
+
+        name = f"Track{track_number}"
+        onsets = {}
+        tick = 0
+        i = 0
+        status = None
+        while i < len(track):
+            delta, i = _read_varlen(track, i)
+            tick += delta
+            if track[i] & 0x80:
+                status = track[i]
+                i += 1
+            if status == 0xFF:
+                meta_type = track[i]
+                meta_length, i = _read_varlen(track, i + 1)
+                if meta_type == 0x03:
+                    name = track[i:i + meta_length].decode("latin-1").rstrip(":").strip()
+                i += meta_length
+                status = None
+            elif status in (0xF0, 0xF7):
+                sysex_length, i = _read_varlen(track, i)
+                i += sysex_length
+                status = None
+            else:
+                kind = status & 0xF0
+                if kind in (0xC0, 0xD0):
+                    i += 1
+                else:
+                    if kind == 0x90 and track[i + 1] > 0:
+                        onsets.setdefault(tick // whole_note, track[i])
+                    i += 2
+
+        if onsets:
+            notes = [None] * (max(onsets) + 1)
+            for slot, note in onsets.items():
+                notes[slot] = note
+            voices[name] = notes
+    return voices
+
+
+def convert_results(paths, corpus_path, key_root=60, is_minor=False):
+    """
+    Append the Counterpoint/CantusFirmus pairs of existing .ly/.midi results
+    to a corpus. A .midi file whose .ly sibling is also in `paths` is the
+    same score and is skipped. Files without both voices are skipped with
+    a warning.
+
+    Returns:
+        Number of pairs appended.
+    """
+    paths = list(paths)
+    lilypond_paths = {path for path in paths if path.endswith(".ly")}
+
+    def pairs():
+        for path in paths:
+            try:
+                if path.endswith(".ly"):
+                    voices = read_lilypond_voices(path)
+                elif path.endswith((".midi", ".mid")):
+                    if os.path.splitext(path)[0] + ".ly" in lilypond_paths:
+                        continue
+                    voices = read_midi_voices(path)
+                else:
+                    continue
+            except (ValueError, OSError, IndexError) as e:
+                print(f"Warning: could not read {path}: {e}", file=sys.stderr)
+                continue
+            if "Counterpoint" not in voices or "CantusFirmus" not in voices:
+                print(f"Warning: {path} has no Counterpoint/CantusFirmus pair.", file=sys.stderr)
+                continue
+            yield voices["Counterpoint"], voices["CantusFirmus"], key_root, is_minor
+
+    return append_pairs(corpus_path, pairs())
+
+
+if __name__ == "__main__":
+    import glob
+
+    corpus_file = os.path.join("result", "voice_pairs.vpc")
+    count = convert_results(sorted(glob.glob(os.path.join("result", "*.ly"))), corpus_file)
+    print(f"Appended {count} pairs to {corpus_file}")
+    with VoicePairCorpus(corpus_file) as corpus:
+        for i, findings in corpus.check():
+            print(i, "passed" if not findings else [rule for rule, _ in findings])
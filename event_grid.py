@@ -0,0 +1,334 @@
+from fractions import Fraction
+
+import numpy as np
+
+from midi_lily import midi_to_lily_pitch
+from multi_voice import (REST, PERFECT_INTERVALS, BASS_PERFECT_INTERVALS, UPPER_DISSONANT_INTERVALS,
+                         BASS_DISSONANT_INTERVALS, PROBLEMATIC_LEAPS, MAX_UPPER_SPACING, MAX_BASS_SPACING,
+                         _class_mask, _runs_of)
+
+TICKS_PER_WHOLE = 96          # divisible down to 32nd notes and by 3 for triplets
+TICKS_PER_BEAT = TICKS_PER_WHOLE // 4
+DOWNBEAT, HALF_BAR, BEAT, OFFBEAT = 3, 2, 1, 0   # beat strength levels
+LILY_DURATIONS = [(TICKS_PER_WHOLE // 2 ** k, str(2 ** k)) for k in range(6)]   # whole note .. 32nd
+
+
+def _ticks(duration):
+    ticks = duration * TICKS_PER_WHOLE
+    if ticks <= 0 or ticks != int(ticks):
+        raise ValueError(f"Duration {duration} is not a positive multiple of 1/{TICKS_PER_WHOLE} whole note")
+    return int(ticks)
+
+
+class EventGrid:
+    """
+    Time-indexed note events of several voices, for species with more than
+    one note per measure.
+
+    Voices are given highest first and bass last, each as a list of
+    (pitch, duration) or (pitch, duration, tied) items: pitch is a MIDI
+    number or None for a rest, duration is in whole notes (1, 1/2, 1/4 ...,
+    floats or Fractions), and tied=True ties the note to the next one, which
+    must have the same pitch. Tied notes are merged into one event.
+
+    Attributes (NumPy arrays, one entry per event, voices one after another
+    and each in time order; times are in ticks, TICKS_PER_WHOLE per whole note):
+        onset, duration, pitch (REST for rests), voice, beat_strength.
+        voice_start: events of voice v are voice_start[v]:voice_start[v+1].
+
+    Simultaneities are the distinct onset times of all voices:
+        times: (S,) sorted onset times.
+        sounding: (V, S) pitch of each voice at each time (REST if silent).
+        attacked: (V, S) True where the voice starts a new event at that time.
+        event_at: (V, S) index of the event sounding in each voice (-1 if none).
+    """
+
+    def __init__(self, voices, measure=1):
+        self.names = list(voices)
+        self.measure_ticks = _ticks(measure)
+        onsets, durations, pitches, voice_ids, starts = [], [], [], [], [0]
+        for v, name in enumerate(self.names):
+            time, tie_open = 0, False
+            for item in voices[name]:
+                pitch, ticks = item[0], _ticks(item[1])
+                tied = len(item) > 2 and bool(item[2]) and pitch is not None
+                if tie_open:
+                    if pitch != pitches[-1]:
+                        raise ValueError(f"{name}: tie from {pitches[-1]} to a different pitch {pitch}")
+                    durations[-1] += ticks
+                else:
+                    onsets.append(time)
+                    durations.append(ticks)
+                    pitches.append(pitch)
+                    voice_ids.append(v)
+                time += ticks
+                tie_open = tied
+            starts.append(len(onsets))
+
+        self.onset = np.array(onsets, dtype=np.int32)
+        self.duration = np.array(durations, dtype=np.int32)
+        self.pitch = np.array([REST if p is None else p for p in pitches], dtype=np.int16)
+        self.voice = np.array(voice_ids, dtype=np.int16)
+        self.voice_start = np.array(starts, dtype=np.int64)
+        self.beat_strength = self.strength_at(self.onset)
+        self._build_simultaneities()
+
+    @classmethod
+    def from_measures(cls, midi_melodies):
+        """Grid of the usual one-note-per-measure melody dict (first species, whole notes)."""
+        return cls({name: [(note, 1) for note in notes] for name, notes in midi_melodies.items()})
+
+    def __len__(self):
+        return len(self.onset)
+
+    def strength_at(self, times):
+        """Beat strength (DOWNBEAT, HALF_BAR, BEAT or OFFBEAT) of tick times within the measure."""
+        position = np.asarray(times) % self.measure_ticks
+        strength = np.full(position.shape, OFFBEAT, dtype=np.int8)
+        strength[position % TICKS_PER_BEAT == 0] = BEAT
+        if (self.measure_ticks // TICKS_PER_BEAT) % 2 == 0:
+            strength[position % (self.measure_ticks // 2) == 0] = HALF_BAR
+        strength[position == 0] = DOWNBEAT
+        return strength
+
+    def _build_simultaneities(self):
+        self.times = np.unique(self.onset)
+        num_voices = len(self.names)
+        self.event_at = np.full((num_voices, len(self.times)), -1, dtype=np.int64)
+        for v in range(num_voices):
+            start, end = self.voice_start[v], self.voice_start[v + 1]
+            if start == end:
+                continue
+            local = np.searchsorted(self.onset[start:end], self.times, side="right") - 1
+            inside = (local >= 0) & (self.times < self.onset[start:end][local] + self.duration[start:end][local])
+            self.event_at[v] = np.where(inside, start + local, -1)
+        sounding_event = self.event_at >= 0
+        self.sounding = np.where(sounding_event, self.pitch[self.event_at], REST).astype(np.int16)
+        self.attacked = sounding_event & (self.onset[self.event_at] == self.times)
+        self.time_strength = self.strength_at(self.times)
+
+    def label(self, time):
+        """'mm 3' for a downbeat, 'mm 3 beat 2.5' otherwise (beats are quarter notes)."""
+        measure, position = divmod(int(time), self.measure_ticks)
+        if position == 0:
+            return f"mm {measure + 1}"
+        beat = Fraction(position, TICKS_PER_BEAT) + 1
+        return f"mm {measure + 1} beat {beat.numerator if beat.denominator == 1 else float(beat):g}"
+
+    def span(self, time1, time2):
+        """'mm 1-2' between downbeats, 'mm 1 beat 3 to mm 2' otherwise."""
+        if time1 % self.measure_ticks == 0 and time2 % self.measure_ticks == 0:
+            return f"mm {time1 // self.measure_ticks + 1}-{time2 // self.measure_ticks + 1}"
+        return f"{self.label(time1)} to {self.label(time2)}"
+
+    def melodic_moves(self):
+        """
+        Moves along each voice's event stream.
+
+        Returns:
+            Tuple (moves, valid): moves[e] is pitch[e+1] - pitch[e]; valid is
+            False where e and e+1 belong to different voices or either is a rest.
+        """
+        pitch = self.pitch.astype(np.int32)
+        moves = np.diff(pitch)
+        valid = (self.voice[1:] == self.voice[:-1]) & (pitch[1:] != REST) & (pitch[:-1] != REST)
+        return moves, valid
+
+    def lilypond_voice(self, v):
+        """
+        LilyPond notes of voice v (pitches inside \\fixed c'), with notes
+        split at barlines and tied, and a bar check after every measure.
+        """
+        tokens = []
+        for e in range(self.voice_start[v], self.voice_start[v + 1]):
+            pitch = None if self.pitch[e] == REST else int(self.pitch[e])
+            name = midi_to_lily_pitch(pitch)
+            time, remaining = int(self.onset[e]), int(self.duration[e])
+            while remaining:
+                piece = min(remaining, self.measure_ticks - time % self.measure_ticks)
+                values = _lily_values(piece)
+                for k, value in enumerate(values):
+                    last = k == len(values) - 1 and piece == remaining
+                    tokens.append(name + value + ("" if last or pitch is None else "~"))
+                time += piece
+                remaining -= piece
+                if time % self.measure_ticks == 0:
+                    tokens.append("|")
+        return " ".join(tokens)
+
+
+def _lily_values(ticks):
+    """Split a duration within one measure into plain and dotted LilyPond values."""
+    values = []
+    for base, name in LILY_DURATIONS:
+        if base % 2 == 0 and ticks >= base * 3 // 2:
+            values.append(name + ".")
+            ticks -= base * 3 // 2
+        elif ticks >= base:
+            values.append(name)
+            ticks -= base
+    if ticks:
+        raise ValueError("Duration cannot be written without tuplets")
+    return values
+
+
+def _prepared(grid, held, other, dissonances, strength):
+    """
+    For held events (one per time, -1 if none), whether each was held over
+    into a stronger beat than the one it started on and was consonant with
+    voice `other` when it started.
+    """
+    safe = np.maximum(held, 0)
+    start = np.searchsorted(grid.times, grid.onset[safe])
+    held_pitch = grid.pitch[safe].astype(np.int32)
+    other_pitch = grid.sounding[other, start].astype(np.int32)
+    consonant = (other_pitch != REST) & ~dissonances[np.abs(held_pitch - other_pitch) % 12]
+    return (held >= 0) & (held_pitch != REST) & (grid.beat_strength[safe] < strength) & consonant
+
+
+def check_events(grid, min_consecutive_moves=3):
+    """
+    Checks an EventGrid of two or more voices.
+
+    Vertical rules are evaluated for each voice pair only at the times where
+    one of the two voices starts a note, and motion between two such times
+    is judged from the pitches sounding there. A dissonance is accepted when
+    only one voice moved into it and it is either a passing or neighbour note
+    (off the downbeat, approached and left by step) or a suspension (a note
+    that was consonant when it started, held over into a stronger beat that
+    is not an offbeat, and then resolved down by step). Melodic rules run along each voice's
+    event stream. The cost is linear in the number of events and
+    simultaneities (times V² voice pairs); for whole notes the findings
+    are those of multi_voice.check_voices.
+
+    Returns:
+        List of (rule_name, report_string) like checking.run_all_checks;
+        empty if no problems were found.
+    """
+    names = grid.names
+    num_voices = len(names)
+    if num_voices < 2 or len(grid) == 0:
+        return []
+
+    moves, move_valid = grid.melodic_moves()
+    step = move_valid & (np.abs(moves) >= 1) & (np.abs(moves) <= 2)
+    step_in = np.concatenate([[False], step])
+    step_out = np.concatenate([step, [False]])
+    step_down_out = np.concatenate([step & (moves < 0), [False]])
+
+    bass_dissonant, upper_dissonant = _class_mask(BASS_DISSONANT_INTERVALS), _class_mask(UPPER_DISSONANT_INTERVALS)
+    bass_perfect, upper_perfect = _class_mask(BASS_PERFECT_INTERVALS), _class_mask(PERFECT_INTERVALS)
+
+    found = []   # (rule order, sort keys..., rule, line), sorted at the end
+
+    for i in range(num_voices - 1):
+        for j in range(i + 1, num_voices):
+            is_bass = j == num_voices - 1
+            pair = f"{names[i]} and {names[j]}"
+            idx = np.nonzero(grid.attacked[i] | grid.attacked[j])[0]
+            hi, lo = grid.sounding[i, idx].astype(np.int32), grid.sounding[j, idx].astype(np.int32)
+            times = grid.times[idx]
+            both = (hi != REST) & (lo != REST)
+            diff = hi - lo
+            interval_class = np.abs(diff) % 12
+
+            # Same precedence as multi_voice: too wide, then crossing, then overlapping
+            limit = MAX_BASS_SPACING if is_bass else MAX_UPPER_SPACING
+            too_wide = both & (np.abs(diff) > limit) if j == i + 1 else np.zeros_like(both)
+            crossing = both & (diff < 0) & ~too_wide
+            for k in np.nonzero(crossing)[0]:
+                found.append((0, times[k], i, j, "voice_crossing",
+                              f"{grid.label(times[k])} voice crossing between {pair} "
+                              f"({names[j]} at {lo[k]} is above {names[i]} at {hi[k]})"))
+
+            if j == i + 1:
+                for k in np.nonzero(too_wide)[0]:
+                    found.append((1, times[k], i, j, "voice_spacing",
+                                  f"{grid.label(times[k])} vertical interval too wide between {pair} "
+                                  f"(actual: {abs(diff[k])} semitones, max allowed: {limit})"))
+
+            # Dissonance, except passing/neighbour notes and suspensions
+            dissonances = (bass_dissonant if is_bass else upper_dissonant)
+            dissonant = both & dissonances[interval_class]
+            ei, ej = grid.event_at[i, idx], grid.event_at[j, idx]
+            only_i = grid.attacked[i, idx] & ~grid.attacked[j, idx]
+            only_j = grid.attacked[j, idx] & ~grid.attacked[i, idx]
+            weak = grid.time_strength[idx] < DOWNBEAT
+            passing_i = only_i & weak & step_in[ei] & step_out[ei]
+            passing_j = only_j & weak & step_in[ej] & step_out[ej]
+            # Suspension: the held note was consonant when it started on a weaker
+            # beat, turns dissonant on a stronger beat and then steps down
+            accented = (grid.time_strength[idx] > OFFBEAT)
+            suspended_i = only_j & accented & _prepared(grid, ei, j, dissonances, grid.time_strength[idx]) \
+                & step_down_out[ei]
+            suspended_j = only_i & accented & _prepared(grid, ej, i, dissonances, grid.time_strength[idx]) \
+                & step_down_out[ej]
+            allowed = passing_i | passing_j | suspended_i | suspended_j
+            for k in np.nonzero(dissonant & ~allowed)[0]:
+                names_table = BASS_DISSONANT_INTERVALS if is_bass else UPPER_DISSONANT_INTERVALS
+                found.append((3, times[k], i, j, "dissonant_interval",
+                              f"{grid.label(times[k])} dissonant vertical interval between {pair}: "
+                              f"{names_table[interval_class[k]]}"))
+
+            if len(idx) < 2:
+                continue
+            # Motion between consecutive times of the pair where both voices sound
+            linked = both[:-1] & both[1:]
+            dir_hi, dir_lo = np.sign(np.diff(hi)), np.sign(np.diff(lo))
+            similar = linked & (dir_hi == dir_lo) & (dir_hi != 0)
+
+            if j == i + 1:
+                overlap = (((lo[1:] > hi[:-1]) & (hi[:-1] != REST)) | ((hi[1:] < lo[:-1]) & (lo[:-1] != REST))) \
+                    & both[1:] & ~crossing[1:] & ~too_wide[1:]
+                for k in np.nonzero(overlap)[0]:
+                    found.append((2, times[k + 1], i, j, "voice_overlapping",
+                                  f"{grid.label(times[k + 1])} voice overlapping between {pair}"))
+
+            perfect = both & (bass_perfect if is_bass else upper_perfect)[interval_class]
+            parallel = perfect[:-1] & perfect[1:] & (interval_class[:-1] == interval_class[1:]) & similar
+            for k in np.nonzero(parallel)[0]:
+                found.append((4, times[k], i, j, "parallel_perfect_intervals",
+                              f"{grid.span(times[k], times[k + 1])} parallel perfect interval between {pair}"))
+
+            runs = _runs_of(similar, min_consecutive_moves)
+            for k in np.nonzero(runs)[0]:
+                found.append((5, times[k], i, j, "parallel_motives",
+                              f"{grid.span(times[k], times[k + min_consecutive_moves])} parallel motives between {pair}"))
+
+    # Melodic rules along each voice's events
+    leap = np.abs(moves)
+    for e in np.nonzero(move_valid & (np.isin(leap, list(PROBLEMATIC_LEAPS)) | (leap > 12)))[0]:
+        size = int(leap[e])
+        kind = f"Dissonant melodic movement of {PROBLEMATIC_LEAPS[size]}" if size in PROBLEMATIC_LEAPS \
+            else f"Very large leap of {size} semitones"
+        found.append((6, grid.voice[e], grid.onset[e], 0, "dissonant_leaps",
+                      f"{grid.span(grid.onset[e], grid.onset[e + 1])} in {names[grid.voice[e]]}: {kind}"))
+    for e in np.nonzero(move_valid & (moves == 0))[0]:
+        found.append((7, grid.voice[e], grid.onset[e], 0, "repeated_notes",
+                      f"{grid.span(grid.onset[e], grid.onset[e + 1])} in {names[grid.voice[e]]}: "
+                      f"Note {grid.pitch[e]} is repeated consecutively."))
+
+    findings = {}
+    for *_, rule, line in sorted(found, key=lambda f: f[:4]):
+        findings.setdefault(rule, []).append(line)
+    return [(rule, "\n".join(lines)) for rule, lines in findings.items()]
+
+
+def check_species(voices, measure=1, min_consecutive_moves=3):
+    """Build an EventGrid from (pitch, duration[, tied]) lists and check it."""
+    return check_events(EventGrid(voices, measure=measure), min_consecutive_moves=min_consecutive_moves)
+
+
+if __name__ == "__main__":
+    # Second species over the usual cantus firmus, with a passing note in mm 2
+    cantus_firmus = [60, 62, 65, 64, 65, 67, 69, 67, 64, 62, 60]
+    counterpoint = [72, 71, 69, 71, 72, 74, 72, 76, 74, 72, 76, 71, 72, 74, 72, 71, 67, 69, 71, 74]
+    example = {
+        "Counterpoint": [(note, Fraction(1, 2)) for note in counterpoint] + [(72, 1)],
+        "CantusFirmus": [(note, 1) for note in cantus_firmus],
+    }
+    grid = EventGrid(example)
+    print(f"{len(grid)} events, {len(grid.times)} simultaneities")
+    print(grid.lilypond_voice(0))
+    for rule, report in check_events(grid):
+        print(f"[{rule}]\n{report}")
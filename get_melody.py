@@ -2,7 +2,10 @@ import re
 import sys
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from check_cache import cached_run_all_checks
+from convergence import ConvergenceTracker
+from lattice import get_lattice
+from llm_client import get_client, create_completion, BudgetExhausted, DEFAULT_TIMEOUT
 # Import checking functions
 from checking import (
     find_parallel_perfect_intervals,
@@ -13,7 +16,8 @@ from checking import (
     find_dissonant_interval,
     check_octave_unison_rules,
     check_key_adherence,
-    analyze_melody_characteristics # Ensure it's imported
+    analyze_melody_characteristics, # Ensure it's imported
+    run_all_checks
 )
 
 EXAMPLE_COUNTERPOINT = [79, 83, 81, 83, 72, 76, 84, 83, 79, 77, 79]
@@ -24,6 +28,19 @@ BASE_URL ="https://openrouter.ai/api/v1"# "https://api.x.ai/v1"##"https://api.si
 api_key = os.getenv("OPEN_API")
 if not api_key:
     raise ValueError("API key not found in .env file")
+
+COUNTERPOINT_RULES = (
+    "You must follow these strict counterpoint rules:\n"
+    "1. Avoid parallel motives (when both voices move in the same direction for 3+ consecutive notes)\n"
+    "2. Avoid parallel perfect intervals (unison, fifth, octave)\n"
+    "3. Maintain proper voice spacing (avoid crossing, overlapping, and intervals > octave + M3)\n"
+    "4. Avoid dissonant leaps (tritones, sevenths, ninths, etc.) in melodies\n"
+    "5. Avoid repeated notes consecutively in the counterpoint.\n"
+    "6. Vertical intervals should generally be consonant (P1, m3, M3, P4, P5, m6, M6, P8). P4 is dissonant against the bass but can be used carefully.\n"
+    "7. Octaves/Unisons are only allowed at the beginning and end of the piece for vertical intervals.\n"
+    "8. Adhere to the specified key (e.g., C Major) and avoid notes outside the key unless modally appropriate or for specific expressive reasons that are resolved.\n\n"
+)
+
 def is_same_melody(midi_dict, example_counterpoint=EXAMPLE_COUNTERPOINT):
     """
     Check if the generated melody is too similar to the example.
@@ -42,13 +59,20 @@ def is_same_melody(midi_dict, example_counterpoint=EXAMPLE_COUNTERPOINT):
     
     return similarity_percentage > 80
 
-def extract_midi_from_response(response_text):
+def extract_midi_from_response(response_text, batch=False):
     """
     Extract MIDI dictionary from LLM response using regex.
     Returns a dictionary with 'Counterpoint' and 'CantusFirmus' keys.
+
+    With batch=True the response is expected to hold a keyed JSON array
+    (see send_batch_to_llm) and a dictionary {exercise_id: midi_dict} is
+    returned instead; exercises that could not be parsed are left out.
     """
     import json
     import re # Ensure re is imported
+
+    if batch:
+        return extract_midi_batch_from_response(response_text)
     
     # First, try to extract JSON from markdown code blocks
     code_block_pattern = r'```(?:json)?\s*({[^`]+})\s*```'
@@ -143,53 +167,143 @@ def extract_midi_from_response(response_text):
 
 
 
-def send_to_llm(conterpoint, initial_comments="", max_attempts=5, use_checking=True):
+def extract_midi_batch_from_response(response_text):
+    """
+    Extract a keyed array of melodies from a batched LLM response, e.g.
+    [{"id": "cf1", "Counterpoint": [...], "CantusFirmus": [...]}, ...]
+
+    Every object is parsed on its own, so one malformed item does not lose
+    the rest of the batch. Returns {exercise_id: midi_dict}.
+    """
+    import json
+
+    melodies = {}
+    if not response_text:
+        return melodies
+
+    for match in re.finditer(r'{[^{}]*}', response_text, re.DOTALL):
+        obj_str = match.group(0)
+        try:
+            item = json.loads(obj_str)
+        except json.JSONDecodeError:
+            try:
+                item = json.loads(obj_str.replace("'", '"'))
+            except json.JSONDecodeError:
+                continue
+        if not isinstance(item, dict):
+            continue
+
+        exercise_id = None
+        counterpoint = None
+        cantus_firmus = None
+        for k, v in item.items():
+            key = k.lower()
+            if key in ('id', 'exercise', 'exercise_id'):
+                exercise_id = str(v)
+            elif key == 'counterpoint':
+                counterpoint = v
+            elif key in ('cantusfirmus', 'cantus_firmus'):
+                cantus_firmus = v
+
+        if exercise_id is None or not isinstance(counterpoint, list) or not isinstance(cantus_firmus, list):
+            continue
+        melodies[exercise_id] = {
+            'Counterpoint': counterpoint,
+            'CantusFirmus': cantus_firmus
+        }
+
+    print(f"Extracted {len(melodies)} melodies from batched response.")
+    return melodies
+
+
+def cantus_firmus_from(conterpoint):
+    """
+    Get the cantus firmus MIDI list from what send_to_llm accepts: a melody
+    dict or a string such as "'CantusFirmus': [60, 62, ...]".
+    Returns None if none can be found.
+    """
+    if isinstance(conterpoint, dict):
+        return conterpoint.get('CantusFirmus')
+    match = re.search(r"(?:CantusFirmus|cantus_firmus)['\"]?\s*:\s*\[([\d\s,]*)\]", str(conterpoint), re.IGNORECASE)
+    if not match:
+        return None
+    return [int(x) for x in match.group(1).split(',') if x.strip().isdigit()]
+
+
+def send_to_llm(conterpoint, initial_comments="", max_attempts=5, use_checking=True,
+                model=MODEL, base_url=BASE_URL, cancel_event=None, timeout=DEFAULT_TIMEOUT,
+                budget=None, convergence=None, use_lattice=False):
     """
     Send the counterpoint to the LLM and return the generated MIDI.
     Optionally uses checking.py to refine the output.
+
+    `model` and `base_url` default to the module constants so several
+    providers can be driven side by side (see racing.py). If `cancel_event`
+    (a threading.Event) gets set, the loop gives up before its next attempt
+    and returns ("Cancelled", None).
+
+    Transport errors are retried with backoff inside llm_client, and every
+    request is charged to `budget` (llm_client.GLOBAL_BUDGET by default,
+    shared by all concurrent callers).
+
+    With checking on, the findings of every attempt go to `convergence`
+    (a ConvergenceTracker; a default one is created if None). When the
+    findings stop improving the loop first switches strategy and then gives
+    up early instead of spending all `max_attempts`; read
+    `convergence.report(max_attempts)` afterwards for attempts and tokens saved.
+
+    With use_lattice=True the allowed notes per measure for this cantus
+    firmus (see lattice.py) are added to the prompt.
     """
     
-    client = OpenAI(
-        api_key=api_key,
-        base_url=BASE_URL
-    )
+    client = get_client(api_key, base_url, timeout=timeout)
     
     system_prompt_base = (
         "You are an expert music composer specializing in counterpoint. "
-        "You must follow these strict counterpoint rules:\n"
-        "1. Avoid parallel motives (when both voices move in the same direction for 3+ consecutive notes)\n"
-        "2. Avoid parallel perfect intervals (unison, fifth, octave)\n"
-        "3. Maintain proper voice spacing (avoid crossing, overlapping, and intervals > octave + M3)\n"
-        "4. Avoid dissonant leaps (tritones, sevenths, ninths, etc.) in melodies\n"
-        "5. Avoid repeated notes consecutively in the counterpoint.\n"
-        "6. Vertical intervals should generally be consonant (P1, m3, M3, P4, P5, m6, M6, P8). P4 is dissonant against the bass but can be used carefully.\n"
-        "7. Octaves/Unisons are only allowed at the beginning and end of the piece for vertical intervals.\n"
-        "8. Adhere to the specified key (e.g., C Major) and avoid notes outside the key unless modally appropriate or for specific expressive reasons that are resolved.\n\n"
+        + COUNTERPOINT_RULES +
         "When given feedback about rule violations, you MUST create a DIFFERENT melody that fixes these issues.\n"
         "Return only valid midi notation in the EXACT same format as the example in json format: "
         "{'Counterpoint': [79, 83, 81, 83, 72, 76, 84, 83, 79, 77, 79], "
         "'CantusFirmus': [60, 62, 65, 64, 65, 67, 69, 67, 64, 62, 60]}"
     )
 
+    lattice_prompt = ""
+    if use_lattice:
+        cantus_firmus = cantus_firmus_from(conterpoint)
+        if cantus_firmus:
+            lattice_prompt = "\n" + get_lattice(cantus_firmus).to_prompt()
+
     current_comments = initial_comments
     attempts_remaining = max_attempts
+    temperature = 0.8
+    if convergence is None:
+        convergence = ConvergenceTracker()
 
     while attempts_remaining > 0:
+        if cancel_event is not None and cancel_event.is_set():
+            print(f"Request to {model} cancelled.")
+            return "Cancelled", None
         llm_response = None # Initialize llm_response here for each attempt
         system_prompt = system_prompt_base
         user_content = f"Complete the following first species counterpoint example. \n{conterpoint}"
+        user_content += lattice_prompt
         user_content += f"\nPlease fix the following problems based on the previous attempt: {current_comments}"
 
         print(f"Sending with comments: {current_comments}")
         try:
-            completion = client.chat.completions.create(
-                model=MODEL,
+            completion = create_completion(
+                client,
+                budget=budget,
+                cancel_event=cancel_event,
+                model=model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_content},
                 ],
-                temperature=0.8 
+                temperature=temperature
             )
+            usage = getattr(completion, "usage", None)
+            convergence.record_tokens(getattr(usage, "total_tokens", None))
             
             llm_response = completion.choices[0].message.content
             print(f"LLM Response content: {llm_response}")
@@ -198,8 +312,9 @@ def send_to_llm(conterpoint, initial_comments="", max_attempts=5, use_checking=T
                 
         except Exception as e:
             print(f"Error calling LLM API: {e}")
-            if attempts_remaining < max_attempts - 1:
-                print(f"Retrying... (attempt {attempts_remaining + 1}/{max_attempts})")
+            attempts_remaining -= 1
+            if attempts_remaining > 0 and not isinstance(e, BudgetExhausted):
+                print(f"Retrying... (attempt {max_attempts - attempts_remaining + 1}/{max_attempts})")
                 continue
             else:
                 print("Max attempts reached. Returning fallback result.")
@@ -215,31 +330,29 @@ def send_to_llm(conterpoint, initial_comments="", max_attempts=5, use_checking=T
             print("Checking generated MIDI...")
             cp = midi_melodies.get('Counterpoint', [])
             cf = midi_melodies.get('CantusFirmus', [])
-            all_feedback = []
 
             # Run all checks from checking.py
-            checks = [
-                (find_parallel_perfect_intervals, (cp, cf)),
-                (find_parallel_motives, (cp, cf)),
-                (check_voice_spacing_crossing_overlapping, (cp, cf)),
-                (find_dissonant_leaps, (cp,)),
-                (check_repeated_notes, (cp,)),
-                (find_dissonant_interval, (cp, cf)),
-                (check_octave_unison_rules, (cp, cf)),
-                (check_key_adherence, (cp,60)),
-                (analyze_melody_characteristics, (cp,)),
-            ]
-
-            for func, args in checks:
-                result = func(*args)
-                if isinstance(result, tuple) and result[0]: # Check returned True and a message
-                    all_feedback.append(result[1])
+            findings = cached_run_all_checks(cp, cf, key_root=60)
+            all_feedback = [report for _, report in findings]
             if all_feedback:
                 current_comments = "\n".join(all_feedback)
                 attempts_remaining -= 1
+                progress = convergence.update(findings)
+                if progress == "stop":
+                    print(f"Stopping early: {convergence.stop_reason}. {convergence.report(max_attempts)}")
+                    return "Failed Output", midi_melodies
                 if attempts_remaining == 0:
                     print("Max attempts reached after checking. Returning last valid MIDI or fallback.")
                     return "Failed Output", midi_melodies # Return the last problematic one if all retries used
+                if progress == "switch":
+                    print("Findings are not improving; asking for a fresh melody at a higher temperature.")
+                    temperature = min(temperature + 0.3, 1.5)
+                    current_comments = (
+                        "Your previous attempts kept breaking these rules: "
+                        + ", ".join(convergence.persistent_rules())
+                        + ". Do not patch the previous melody; write a completely new counterpoint.\n"
+                        + current_comments
+                    )
                 system_prompt_base += ("\n\nIMPORTANT: Your previous response had rule violations. "
                                         "Please address the feedback.")
                 continue # Go to next iteration of the while loop to resend with comments
@@ -261,5 +374,97 @@ def send_to_llm(conterpoint, initial_comments="", max_attempts=5, use_checking=T
     
         if attempts_remaining > 0:
             print(f"LLM returned invalid format or issues found. Trying again (attempt {max_attempts - attempts_remaining + 1}/{max_attempts})...")
-    
-    
\ No newline at end of file
+
+    return "Failed Output", None
+
+
+def send_batch_to_llm(exercises, batch_size=5, max_attempts=5, model=MODEL, base_url=BASE_URL,
+                      timeout=DEFAULT_TIMEOUT, budget=None):
+    """
+    Generate counterpoints for several cantus firmi with one request per batch.
+
+    Up to `batch_size` exercises are packed into one prompt and the model is
+    asked for a keyed JSON array back. Each returned melody is checked on
+    its own; only the exercises that failed (or were missing from the reply)
+    are sent again, together with their feedback, in the next request.
+
+    Args:
+        exercises: Dictionary {exercise_id: cantus firmus}, the cantus firmus
+                   in the same form send_to_llm accepts.
+        batch_size: Number of exercises per request.
+        max_attempts: Number of requests spent on each batch at most.
+
+    Returns:
+        Dictionary {exercise_id: (result, midi_melodies)} with the same result
+        strings as send_to_llm ("Successful Output", "Failed Output" or
+        "Error: ...").
+    """
+    client = get_client(api_key, base_url, timeout=timeout)
+
+    system_prompt = (
+        "You are an expert music composer specializing in counterpoint. "
+        + COUNTERPOINT_RULES +
+        "You will be given several exercises, each with an id. "
+        "When given feedback about rule violations for an exercise, you MUST create a DIFFERENT melody that fixes these issues.\n"
+        "Return only a JSON array with one object per exercise, using the exercise id as given: "
+        '[{"id": "ex1", "Counterpoint": [79, 83, 81, 83, 72, 76, 84, 83, 79, 77, 79], '
+        '"CantusFirmus": [60, 62, 65, 64, 65, 67, 69, 67, 64, 62, 60]}]'
+    )
+
+    results = {}
+    exercise_ids = [str(exercise_id) for exercise_id in exercises]
+    exercises = {str(k): v for k, v in exercises.items()}
+
+    for start in range(0, len(exercise_ids), batch_size):
+        pending = {exercise_id: "" for exercise_id in exercise_ids[start:start + batch_size]}
+        last_melodies = {}
+        attempts_remaining = max_attempts
+
+        while pending and attempts_remaining > 0:
+            user_content = "Complete the following first species counterpoint exercises.\n"
+            for exercise_id, comments in pending.items():
+                user_content += f"\nExercise id {exercise_id}:\n{exercises[exercise_id]}\n"
+                if comments:
+                    user_content += f"Please fix the following problems based on the previous attempt: {comments}\n"
+
+            print(f"Sending batch of {len(pending)} exercises: {list(pending)}")
+            attempts_remaining -= 1
+            try:
+                completion = create_completion(
+                    client,
+                    budget=budget,
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content},
+                    ],
+                    temperature=0.8
+                )
+                llm_response = completion.choices[0].message.content
+            except Exception as e:
+                print(f"Error calling LLM API: {e}")
+                if isinstance(e, BudgetExhausted):
+                    break
+                continue
+
+            batch_melodies = extract_midi_from_response(llm_response, batch=True)
+            for exercise_id in list(pending):
+                midi_melodies = batch_melodies.get(exercise_id)
+                if not midi_melodies:
+                    pending[exercise_id] = "This exercise was missing from your previous answer or was not valid JSON."
+                    continue
+                last_melodies[exercise_id] = midi_melodies
+                findings = cached_run_all_checks(midi_melodies['Counterpoint'], midi_melodies['CantusFirmus'], key_root=60)
+                if findings:
+                    pending[exercise_id] = "\n".join(report for _, report in findings)
+                else:
+                    results[exercise_id] = ("Successful Output", midi_melodies)
+                    del pending[exercise_id]
+
+        for exercise_id in pending:
+            if exercise_id in last_melodies:
+                results[exercise_id] = ("Failed Output", last_melodies[exercise_id])
+            else:
+                results[exercise_id] = ("Error: no valid melody after max attempts", None)
+
+    return results
@@ -0,0 +1,187 @@
+import functools
+
+MAX_ALLOWED_INTERVAL = 16          # octave and a major third, as in check_voice_spacing_crossing_overlapping
+DISSONANT_INTERVALS = {1, 2, 6, 10, 11}
+PERFECT_INTERVALS = {0, 5, 7}
+PROBLEMATIC_LEAPS = {6, 10, 11}
+MAJOR_SCALE = {0, 2, 4, 5, 7, 9, 11}
+NATURAL_MINOR_SCALE = {0, 2, 3, 5, 7, 8, 10}
+MELODIC_MINOR_ASCENDING_SCALE = {0, 2, 3, 5, 7, 9, 11}
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+
+def _note_name(pitch):
+    return f"{NOTE_NAMES[pitch % 12]}{pitch // 12 - 1}"
+
+
+class CandidateLattice:
+    """
+    Which counterpoint pitches are possible at each position above a fixed
+    cantus firmus, and which moves between adjacent positions are allowed.
+
+    Position sets encode the vertical rules (consonance, no crossing, spacing
+    up to MAX_ALLOWED_INTERVAL, octave/unison only at the ends with the last
+    one required, key). Transition tables encode the rules between two
+    neighbouring positions (dissonant or very large leaps, repeated notes,
+    parallel perfect intervals, overlapping, raised 6th/7th in minor only
+    when ascending). Rules over longer spans (parallel motives, apex, note
+    variety) are left to checking.py.
+
+    Attributes:
+        allowed: List with one sorted tuple of pitches per position.
+        transitions: List with one dict per adjacent pair of positions,
+                     mapping a pitch at i to the frozenset of pitches allowed at i+1.
+    """
+
+    def __init__(self, cantus_firmus, key_root=60, is_minor=False):
+        self.cantus_firmus = list(cantus_firmus)
+        self.key_root = key_root
+        self.is_minor = is_minor
+        self.allowed = [tuple(self._position_candidates(i)) for i in range(len(self.cantus_firmus))]
+        self.transitions = [self._transition_table(i) for i in range(len(self.cantus_firmus) - 1)]
+
+    def _in_key(self, pitch):
+        degree = (pitch - self.key_root) % 12
+        if self.is_minor:
+            return degree in NATURAL_MINOR_SCALE or degree in MELODIC_MINOR_ASCENDING_SCALE
+        return degree in MAJOR_SCALE
+
+    def _position_candidates(self, i):
+        cf_note = self.cantus_firmus[i]
+        last = len(self.cantus_firmus) - 1
+        if cf_note is None:
+            notes = [n for n in self.cantus_firmus if n is not None]
+            low, high = (min(notes), max(notes) + MAX_ALLOWED_INTERVAL) if notes else (48, 84)
+            return [p for p in range(low, high + 1) if self._in_key(p)]
+
+        candidates = []
+        for pitch in range(cf_note, cf_note + MAX_ALLOWED_INTERVAL + 1):
+            interval_type = (pitch - cf_note) % 12
+            if interval_type in DISSONANT_INTERVALS or not self._in_key(pitch):
+                continue
+            if i == 0 and self.is_minor and (pitch - self.key_root) % 12 not in NATURAL_MINOR_SCALE:
+                continue  # nothing to ascend from
+            if 0 < i < last and interval_type == 0:
+                continue
+            if i == last and last > 0 and interval_type != 0:
+                continue
+            candidates.append(pitch)
+        return candidates
+
+    def _move_allowed(self, i, a, b):
+        leap = abs(b - a)
+        if leap == 0 or leap in PROBLEMATIC_LEAPS or leap > 12:
+            return False
+        if self.is_minor:
+            # As in check_key_adherence: melodic minor when approached ascending, natural otherwise
+            scale = MELODIC_MINOR_ASCENDING_SCALE if b > a else NATURAL_MINOR_SCALE
+            if (b - self.key_root) % 12 not in scale:
+                return False
+
+        cf_a, cf_b = self.cantus_firmus[i], self.cantus_firmus[i + 1]
+        if cf_a is None or cf_b is None:
+            return True
+        if cf_b > a or b < cf_a:
+            return False  # overlapping
+        type_a, type_b = (a - cf_a) % 12, (b - cf_b) % 12
+        if type_a == type_b and type_a in PERFECT_INTERVALS:
+            dir_cp, dir_cf = b - a, cf_b - cf_a
+            if dir_cp and dir_cf and (dir_cp > 0) == (dir_cf > 0):
+                return False  # parallel perfect interval
+        return True
+
+    def _transition_table(self, i):
+        return {a: frozenset(b for b in self.allowed[i + 1] if self._move_allowed(i, a, b))
+                for a in self.allowed[i]}
+
+    def __len__(self):
+        return len(self.allowed)
+
+    def is_allowed(self, i, pitch):
+        return pitch in self.allowed[i]
+
+    def allowed_next(self, i, pitch):
+        """Pitches allowed at position i+1 after `pitch` at position i."""
+        return self.transitions[i].get(pitch, frozenset())
+
+    def violations(self, counterpoint):
+        """
+        Positions (1-based, like the "mm" numbers in checking.py) where the
+        counterpoint leaves the lattice: the note itself is impossible there,
+        or the move into it from the previous note is not allowed.
+        """
+        problems = []
+        for i, pitch in enumerate(counterpoint[:len(self.allowed)]):
+            if pitch not in self.allowed[i]:
+                problems.append(i + 1)
+            elif i > 0 and counterpoint[i - 1] in self.allowed[i - 1] \
+                    and pitch not in self.transitions[i - 1][counterpoint[i - 1]]:
+                problems.append(i + 1)
+        if len(counterpoint) != len(self.allowed):
+            problems.append(min(len(counterpoint), len(self.allowed)) + 1)
+        return problems
+
+    def filter_candidates(self, candidates):
+        """Keep only the candidate counterpoints that stay inside the lattice."""
+        return [cp for cp in candidates if not self.violations(cp)]
+
+    def count_paths(self):
+        """Number of counterpoints consistent with the lattice (0 means the exercise is impossible)."""
+        if not self.allowed:
+            return 0
+        ways = {pitch: 1 for pitch in self.allowed[0]}
+        for table in self.transitions:
+            following = {}
+            for a, count in ways.items():
+                for b in table.get(a, ()):
+                    following[b] = following.get(b, 0) + count
+            ways = following
+        return sum(ways.values())
+
+    def prune_dead_ends(self):
+        """
+        Remove pitches that cannot be part of any complete counterpoint
+        (no way in from the start or no way on to the end). Returns self.
+        """
+        reachable = [set(self.allowed[0])] if self.allowed else []
+        for i, table in enumerate(self.transitions):
+            reachable.append({b for a in reachable[i] for b in table.get(a, ())})
+        alive = reachable[-1] if reachable else set()
+        keep = [set() for _ in self.allowed]
+        if keep:
+            keep[-1] = alive
+        for i in range(len(self.transitions) - 1, -1, -1):
+            keep[i] = {a for a in reachable[i] if self.transitions[i].get(a, frozenset()) & keep[i + 1]}
+        self.allowed = [tuple(sorted(k)) for k in keep]
+        self.transitions = [{a: self.transitions[i][a] & keep[i + 1] for a in keep[i]}
+                            for i in range(len(self.transitions))]
+        return self
+
+    def to_prompt(self):
+        """Render the allowed pitches per measure as text for the LLM prompt."""
+        lines = ["Allowed counterpoint notes per measure (MIDI numbers); every note must come from its measure's list:"]
+        for i, pitches in enumerate(self.allowed):
+            choices = ", ".join(f"{p} ({_note_name(p)})" for p in pitches)
+            lines.append(f"mm {i+1}: {choices if choices else 'no valid note'}")
+        return "\n".join(lines)
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_lattice(cantus_firmus, key_root, is_minor):
+    return CandidateLattice(cantus_firmus, key_root, is_minor).prune_dead_ends()
+
+
+def get_lattice(cantus_firmus, key_root=60, is_minor=False):
+    """
+    Lattice for a cantus firmus, built once and reused for later calls with
+    the same cantus firmus and key. Dead-end pitches are already pruned.
+    Treat the returned lattice as read-only.
+    """
+    return _cached_lattice(tuple(cantus_firmus), key_root, bool(is_minor))
+
+
+if __name__ == "__main__":
+    lattice = get_lattice([60, 62, 65, 64, 65, 67, 69, 67, 64, 62, 60])
+    print(lattice.to_prompt())
+    print("Counterpoints in lattice:", lattice.count_paths())
+    print("Violations of example:", lattice.violations([79, 83, 81, 83, 72, 76, 84, 83, 79, 77, 79]))
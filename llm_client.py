@@ -0,0 +1,197 @@
+import random
+import sys
+import threading
+import time
+
+import openai
+from openai import OpenAI
+
+DEFAULT_TIMEOUT = 120.0  # seconds per request
+MAX_RETRIES = 4          # transport-level retries inside one attempt
+BACKOFF_BASE = 1.0       # seconds
+BACKOFF_CAP = 60.0       # seconds
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key, base_url, timeout=DEFAULT_TIMEOUT):
+    """
+    Return a shared OpenAI client for (base_url, timeout).
+
+    The client keeps its HTTP connection pool between calls, so repeated
+    requests to the same provider reuse open connections. The SDK's own
+    retries are disabled; `create_completion` does the retrying.
+    """
+    key = (api_key, base_url, timeout)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+            _clients[key] = client
+        return client
+
+
+class BudgetExhausted(Exception):
+    """Raised when the shared request or time budget has been used up."""
+
+
+class RequestBudget:
+    """
+    Request and wall-time budget shared by every caller of `create_completion`.
+
+    `max_requests` caps the number of HTTP requests, `max_seconds` the time
+    since the budget was created (or reset). None means unlimited.
+    """
+
+    def __init__(self, max_requests=None, max_seconds=None):
+        self._lock = threading.Lock()
+        self.reset(max_requests, max_seconds)
+
+    def reset(self, max_requests=None, max_seconds=None):
+        with self._lock:
+            self.max_requests = max_requests
+            self.max_seconds = max_seconds
+            self.requests_used = 0
+            self.started_at = time.monotonic()
+
+    def remaining_time(self):
+        if self.max_seconds is None:
+            return None
+        return max(0.0, self.max_seconds - (time.monotonic() - self.started_at))
+
+    def exhausted(self):
+        with self._lock:
+            if self.max_requests is not None and self.requests_used >= self.max_requests:
+                return True
+        remaining = self.remaining_time()
+        return remaining is not None and remaining <= 0
+
+    def acquire(self):
+        """Take one request from the budget; raises BudgetExhausted if none is left."""
+        remaining = self.remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise BudgetExhausted("time budget exhausted")
+        with self._lock:
+            if self.max_requests is not None and self.requests_used >= self.max_requests:
+                raise BudgetExhausted(f"request budget of {self.max_requests} exhausted")
+            self.requests_used += 1
+
+
+class LLMMetrics:
+    """Thread-safe counters for requests, retries and time spent waiting."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.failures = 0
+            self.retries = 0
+            self.rate_limited = 0
+            self.request_seconds = 0.0
+            self.backoff_seconds = 0.0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "request_seconds": round(self.request_seconds, 3),
+                "backoff_seconds": round(self.backoff_seconds, 3),
+            }
+
+
+GLOBAL_BUDGET = RequestBudget()
+METRICS = LLMMetrics()
+
+
+def configure_budget(max_requests=None, max_seconds=None):
+    """Reset the global budget shared by all send_to_llm callers."""
+    GLOBAL_BUDGET.reset(max_requests, max_seconds)
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, connection errors and 5xx responses are worth retrying."""
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+def retry_after_seconds(error):
+    """Read the Retry-After (or retry-after-ms) header of an API error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None  # HTTP-date form; fall back to our own backoff
+    return None
+
+
+def backoff_delay(retry, retry_after=None, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(cap, base * (2 ** retry)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def create_completion(client, budget=None, metrics=None, max_retries=MAX_RETRIES,
+                      cancel_event=None, **kwargs):
+    """
+    Call client.chat.completions.create with bounded, jittered retries.
+
+    Every request is charged to `budget`; backoff never sleeps past the
+    budget's remaining time. Non-retryable errors (bad request, auth) are
+    raised straight away, retryable ones after `max_retries` retries.
+    Raises BudgetExhausted when the budget runs out.
+    """
+    budget = GLOBAL_BUDGET if budget is None else budget
+    metrics = METRICS if metrics is None else metrics
+
+    retry = 0
+    while True:
+        budget.acquire()
+        started = time.monotonic()
+        try:
+            completion = client.chat.completions.create(**kwargs)
+            metrics.add(requests=1, request_seconds=time.monotonic() - started)
+            return completion
+        except Exception as e:
+            metrics.add(requests=1, failures=1, request_seconds=time.monotonic() - started)
+            if isinstance(e, openai.RateLimitError):
+                metrics.add(rate_limited=1)
+            if not is_retryable(e) or retry >= max_retries:
+                raise
+
+            if budget.exhausted():
+                raise BudgetExhausted(f"budget exhausted after: {e}") from e
+            delay = backoff_delay(retry, retry_after_seconds(e))
+            remaining = budget.remaining_time()
+            if remaining is not None and delay >= remaining:
+                raise BudgetExhausted(f"no time left to retry after: {e}") from e
+            print(f"LLM request failed ({e}); retrying in {delay:.1f}s", file=sys.stderr)
+            metrics.add(retries=1, backoff_seconds=delay)
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    raise
+            else:
+                time.sleep(delay)
+            retry += 1
@@ -2,8 +2,10 @@ import checking
 from get_melody import *
 from checking import *
 from midi_lily import midi_to_lilypond
+from artifact_store import ArtifactStore
 import os
 import datetime # Import datetime
+import tempfile
 from get_melody import send_to_llm, MODEL # Ensure MODEL is imported
 from checking import *
 import os
@@ -27,8 +29,13 @@ if midi_melodies is None or "Error:" in result:
     print(f"Failed to generate initial melody: {result}")
     exit(1)
 
+# Outputs are engraved into a temporary directory and kept only in the artifact store
+work_dir = tempfile.TemporaryDirectory()
 raw_midi_melodies = midi_melodies.copy()
-midi_to_lilypond(raw_midi_melodies, raw_output_file_name, generate_pdf=True, llm_name=MODEL, composition_detail=result)
+try:
+    midi_to_lilypond(raw_midi_melodies, os.path.join(work_dir.name, raw_output_file_name), generate_pdf=True, llm_name=MODEL, composition_detail=result)
+except ValueError as e:
+    print(f"Could not engrave the raw output: {e}")
 
 # Try to improve with checking
 checked_result, new_midi_melodies = send_to_llm(conterpoint=midi_melodies, use_checking=True)
@@ -43,7 +50,19 @@ else:
     final_result = result
     print(f"Using original melody due to checking failure: {checked_result}")
 
-midi_to_lilypond(final_melodies, lilypond_file_name, generate_pdf=True, llm_name=MODEL, composition_detail=final_result)
+try:
+    midi_to_lilypond(final_melodies, os.path.join(work_dir.name, lilypond_file_name), generate_pdf=True, llm_name=MODEL, composition_detail=final_result)
+except ValueError as e:
+    print(f"Could not engrave the final output: {e}")
+
+# Keep each output once in the content-addressed store, indexed by model, date and variant
+with ArtifactStore() as store, work_dir:
+    for variant, base_name in (("raw", f"{output_base_filename}_RawOutput"), ("checked", output_base_filename)):
+        for kind in ("ly", "midi", "pdf"):
+            path = os.path.join(work_dir.name, f"{base_name}.{kind}")
+            if os.path.exists(path):
+                digest = store.store_file(path, safe_model_name, today_date, variant, kind)
+                print(f"Stored {base_name}.{kind} as {digest[:12]}")
 
     
     
\ No newline at end of file
@@ -1,6 +1,103 @@
+import operator
 import re # Ensure re is imported if note_to_midi is used, or remove if not.
 from datetime import datetime # Added for date
 
+LILYPOND_VERSION = "2.24.4"
+LILY_NOTE_NAMES = ["c", "cis", "d", "dis", "e", "f", "fis", "g", "gis", "a", "ais", "b"]
+
+
+def midi_to_lily_pitch(note):
+    """
+    Convert a MIDI note number to a LilyPond pitch inside \\fixed c'.
+
+    Works for the whole MIDI range: middle C (60) is "c", each octave up
+    adds a "'" and each octave down a ",". Returns "r" for a rest (None).
+    Whole-number floats such as 60.0 (from JSON) are accepted; any other
+    value raises ValueError.
+    """
+    if note is None:
+        return "r"
+    try:
+        note = operator.index(note)
+    except TypeError:
+        if not (isinstance(note, float) and note.is_integer()):
+            raise ValueError(f"MIDI note {note!r} is not a whole number") from None
+        note = int(note)
+    if not 0 <= note <= 127:
+        raise ValueError(f"MIDI note {note} is outside 0-127")
+    octave_shift = note // 12 - 5
+    marks = "'" * octave_shift if octave_shift > 0 else "," * -octave_shift
+    return LILY_NOTE_NAMES[note % 12] + marks
+
+
+def _lilypond_header(llm_name, generation_date, composition_detail, indent=""):
+    if generation_date is None:
+        generation_date = datetime.now().strftime("%Y-%m-%d")
+    subtitle = f"Generated by {llm_name} on {generation_date}"
+    if composition_detail:
+        subtitle += f" ({composition_detail})"
+    content = f"{indent}\\header {{\n"
+    content += f"{indent}  title = \"First Species Counterpoint Composed by LLM\"\n"
+    content += f"{indent}  subtitle = \"{subtitle}\"\n"
+    content += f"{indent}}}\n"
+    return content
+
+
+def _lilypond_score(midi_melodies, indent="", include_midi=True):
+    content = f"{indent}\\score {{\n"
+    content += f"{indent}  <<\n"
+
+    # Add each voice
+    for voice_name, midi_notes in midi_melodies.items():
+        notes_str = " | ".join(f"{midi_to_lily_pitch(note)}1" for note in midi_notes)
+
+        # Add the staff for this voice - note the proper escaping
+        content += f"{indent}    \\new Staff = \"{voice_name}\" <<\n"
+        content += f"{indent}      \\clef treble\n"
+        content += f"{indent}      \\key c \\major\n"
+        content += f"{indent}      \\time 4/4\n"
+        content += f"{indent}      \\fixed c' {{ \n"
+        content += f"{indent}        {notes_str}\n"
+        content += f"{indent}      }}\n"
+        content += f"{indent}    >>\n"
+
+    # Close the score
+    content += f"{indent}  >>\n"
+    content += f"{indent}  \\layout {{ }}\n"
+    if include_midi:
+        content += f"{indent}  \\midi {{ \\tempo 1 = 80 }}\n"
+    content += f"{indent}}}\n"
+    return content
+
+
+def _run_lilypond(output_filename):
+    """Run LilyPond on a .ly file; returns the PDF path or None on failure."""
+    import os
+    import subprocess
+
+    try:
+        # Run LilyPond to generate PDF; -o keeps the outputs next to the .ly file
+        result = subprocess.run(['lilypond', '-o', os.path.splitext(output_filename)[0], output_filename],
+                               capture_output=True,
+                               text=True,
+                               check=True)
+
+        # Get the PDF filename (same as LilyPond file but with .pdf extension)
+        pdf_filename = os.path.splitext(output_filename)[0] + '.pdf'
+
+        if os.path.exists(pdf_filename):
+            print(f"PDF file created: {pdf_filename}")
+            return pdf_filename
+        print("PDF generation failed. Check if LilyPond is installed correctly.")
+        print(result.stderr)
+    except subprocess.CalledProcessError as e:
+        print(f"Error generating PDF: {e}")
+        print(e.stderr)
+    except FileNotFoundError:
+        print("LilyPond not found. Make sure it's installed and in your PATH.")
+    return None
+
+
 def midi_to_lilypond(midi_melodies, output_filename="generated_score.ly", generate_pdf=True, llm_name="Unknown LLM", generation_date=None, composition_detail=""):
     """Convert a dictionary of MIDI note numbers to a LilyPond file and optionally generate a PDF.
     
@@ -11,63 +108,11 @@ def midi_to_lilypond(midi_melodies, output_filename="generated_score.ly", genera
         llm_name: The name of the LLM generating the music.
         generation_date: The date of generation (string format YYYY-MM-DD).
     """
-    # MIDI note number to LilyPond note name mapping
-    midi_to_note = {
-        60: "c", 61: "cis", 62: "d", 63: "dis", 64: "e", 65: "f",
-        66: "fis", 67: "g", 68: "gis", 69: "a", 70: "ais", 71: "b",
-        # Lower octave
-        48: "c,", 49: "cis,", 50: "d,", 51: "dis,", 52: "e,", 53: "f,",
-        54: "fis,", 55: "g,", 56: "gis,", 57: "a,", 58: "ais,", 59: "b,",
-        # Higher octave
-        72: "c'", 73: "cis'", 74: "d'", 75: "dis'", 76: "e'", 77: "f'",
-        78: "fis'", 79: "g'", 80: "gis'", 81: "a'", 82: "ais'", 83: "b'", 85: "c''", 86: "cis''", 87: "d''", 88: "dis''", 89: "e''", 90: "f''",
-    }
-    
     # Create the LilyPond file content - note the raw string and proper escaping
-    lilypond_content = "\\version \"2.24.4\"\n"
-    lilypond_content += "\\header {\n"
-    lilypond_content += "  title = \"First Species Counterpoint Composed by LLM\"\n"
-    if generation_date is None:
-        generation_date = datetime.now().strftime("%Y-%m-%d")
-    
-    subtitle = f"Generated by {llm_name} on {generation_date}"
-    if composition_detail:
-        subtitle += f" ({composition_detail})"
-    lilypond_content += f"  subtitle = \"{subtitle}\"\n" # Modified subtitle
-    lilypond_content += "}\n\n"
-    lilypond_content += "\score {\n"
-    # lilypond_content += "  \tempo 1 = 80 \n"  # Remove from here
-    lilypond_content += "  <<\n"
-    
-    # Add each voice
-    for voice_name, midi_notes in midi_melodies.items():
-        
-        notes_str = ""
-        for note in midi_notes:
-            if note in midi_to_note:
-                notes_str += f"{midi_to_note[note]}1 | "
-            else:
-                # Handle notes outside our mapping
-                notes_str += "r1 | "  # Use rest as fallback
-        
-        # Remove trailing bar line and space
-        notes_str = notes_str.rstrip("| ")
-        
-        # Add the staff for this voice - note the proper escaping
-        lilypond_content += f"    \\new Staff = \"{voice_name}\" <<\n"
-        lilypond_content += f"      \\clef treble\n"
-        lilypond_content += f"      \\key c \\major\n"
-        lilypond_content += f"      \\time 4/4\n"
-        lilypond_content += f"      \\fixed c' {{ \n"
-        lilypond_content += f"        {notes_str}\n"
-        lilypond_content += f"      }}\n"
-        lilypond_content += f"    >>\n"
-    
-    # Close the score
-    lilypond_content += "  >>\n"
-    lilypond_content += "  \layout { }\n"
-    lilypond_content += "  \midi { \\tempo 1 = 80 }\n"  # Corrected typo: empo -> tempo
-    lilypond_content += "}\n"
+    lilypond_content = f"\\version \"{LILYPOND_VERSION}\"\n"
+    lilypond_content += _lilypond_header(llm_name, generation_date, composition_detail)
+    lilypond_content += "\n"
+    lilypond_content += _lilypond_score(midi_melodies)
     
     # Write to file
     with open(output_filename, 'w') as f:
@@ -77,33 +122,49 @@ def midi_to_lilypond(midi_melodies, output_filename="generated_score.ly", genera
     
     # Generate PDF if requested
     if generate_pdf:
-        import os
-        import subprocess
-        
-        try:
-            # Run LilyPond to generate PDF
-            result = subprocess.run(['lilypond', output_filename], 
-                                   capture_output=True, 
-                                   text=True, 
-                                   check=True)
-            
-            # Get the PDF filename (same as LilyPond file but with .pdf extension)
-            pdf_filename = os.path.splitext(output_filename)[0] + '.pdf'
-            
-            if os.path.exists(pdf_filename):
-                print(f"PDF file created: {pdf_filename}")
-            else:
-                print("PDF generation failed. Check if LilyPond is installed correctly.")
-                print(result.stderr)
-        except subprocess.CalledProcessError as e:
-            print(f"Error generating PDF: {e}")
-            print(e.stderr)
-        except FileNotFoundError:
-            print("LilyPond not found. Make sure it's installed and in your PATH.")
+        _run_lilypond(output_filename)
     
     return lilypond_content
 
-def note_to_midi(note_str): #unused
+
+def write_lilypond_book(scores, output_filename="generated_book.ly", generate_pdf=True, include_midi=False):
+    """Write many scores into one LilyPond \\book and engrave them with a single lilypond run.
+
+    Each score becomes its own \\bookpart with its own header, so the PDF has
+    one page (or more) per piece. Scores are written to the file as they are
+    read from `scores`, so an iterator over a large corpus keeps memory flat.
+
+    Args:
+        scores: Iterable of dictionaries with a 'midi_melodies' key and
+                optional 'llm_name', 'generation_date' and 'composition_detail'
+                keys (same meaning as in midi_to_lilypond).
+        output_filename: Name of the output LilyPond file
+        generate_pdf: Whether to generate the PDF with one LilyPond run
+        include_midi: Also write one MIDI file per score (slower to engrave)
+
+    Returns:
+        Number of scores written.
+    """
+    count = 0
+    with open(output_filename, 'w') as f:
+        f.write(f"\\version \"{LILYPOND_VERSION}\"\n")
+        f.write("\\book {\n")
+        for score in scores:
+            f.write("  \\bookpart {\n")
+            f.write(_lilypond_header(score.get('llm_name', "Unknown LLM"), score.get('generation_date'),
+                                     score.get('composition_detail', ""), indent="    "))
+            f.write(_lilypond_score(score['midi_melodies'], indent="    ", include_midi=include_midi))
+            f.write("  }\n")
+            count += 1
+        f.write("}\n")
+
+    print(f"LilyPond book created: {output_filename} ({count} scores)")
+
+    if generate_pdf and count:
+        _run_lilypond(output_filename)
+    return count
+
+def note_to_midi(note_str):
     """
     Convert a LilyPond note string to its MIDI value.
     Handles pitch, accidentals, and octave marks.
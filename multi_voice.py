@@ -0,0 +1,203 @@
+import numpy as np
+
+REST = -1  # value used for None (rest) in the pitch array
+
+PERFECT_INTERVALS = [0, 7]             # P1/P8, P5 between any two voices
+BASS_PERFECT_INTERVALS = [0, 5, 7]     # against the bass P4 counts as perfect too (as in checking.py)
+UPPER_DISSONANT_INTERVALS = {1: "minor second", 2: "major second", 6: "tritone",
+                             10: "minor seventh", 11: "major seventh"}
+BASS_DISSONANT_INTERVALS = {**UPPER_DISSONANT_INTERVALS, 5: "perfect fourth"}
+PROBLEMATIC_LEAPS = {6: "Tritone", 10: "10s (e.g., m7/Aug6)", 11: "11s (e.g., M7/Dim8)"}
+
+MAX_UPPER_SPACING = 12   # adjacent upper voices within an octave
+MAX_BASS_SPACING = 16    # lowest upper voice to bass: octave and a major third (MAX_ALLOWED_INTERVAL in checking.py)
+
+
+def voices_to_array(midi_melodies):
+    """
+    Stack the voices of a melody dict into a (V, L) int16 array, top voice first.
+
+    Voices are taken in dict order, highest voice first and bass last (the
+    order send_to_llm uses: Counterpoint, CantusFirmus). Shorter voices and
+    rests (None) are filled with REST.
+
+    Returns:
+        Tuple (names, pitches, valid) where valid is the boolean rest mask.
+    """
+    names = list(midi_melodies.keys())
+    length = max((len(notes) for notes in midi_melodies.values()), default=0)
+    pitches = np.full((len(names), length), REST, dtype=np.int16)
+    for v, name in enumerate(names):
+        notes = midi_melodies[name]
+        pitches[v, :len(notes)] = [REST if note is None else note for note in notes]
+    return names, pitches, pitches != REST
+
+
+def _pair_masks(num_voices):
+    """Boolean (V, V) masks selecting upper pairs and pairs against the bass (i above j)."""
+    above = np.triu(np.ones((num_voices, num_voices), dtype=bool), k=1)
+    bass_pairs = np.zeros_like(above)
+    bass_pairs[:, num_voices - 1] = above[:, num_voices - 1]
+    return above & ~bass_pairs, bass_pairs
+
+
+def _class_mask(interval_classes):
+    """Lookup table: True for the interval classes (0-11) given."""
+    classes = np.zeros(12, dtype=bool)
+    classes[list(interval_classes)] = True
+    return classes
+
+
+def _runs_of(mask, run_length):
+    """For a (..., T) boolean array, mark positions t where mask[t:t+run_length] is all True."""
+    if mask.shape[-1] < run_length:
+        return np.zeros(mask.shape[:-1] + (0,), dtype=bool)
+    counts = np.cumsum(mask, axis=-1, dtype=np.int32)
+    counts = np.concatenate([np.zeros(mask.shape[:-1] + (1,), dtype=np.int32), counts], axis=-1)
+    return (counts[..., run_length:] - counts[..., :-run_length]) == run_length
+
+
+def _hits(mask):
+    """(i, j, t) indices of a (V, V, T) mask, ordered by position t."""
+    t, i, j = np.nonzero(mask.transpose(2, 0, 1))
+    return zip(i.tolist(), j.tolist(), t.tolist())
+
+
+def _report(findings_by_rule, rule, lines):
+    if lines:
+        findings_by_rule.setdefault(rule, []).extend(lines)
+
+
+def check_voices(midi_melodies, min_consecutive_moves=3):
+    """
+    Checks any number of voices at once.
+
+    All voice pairs are evaluated together on V×V×L arrays, so the cost
+    grows with the number of pairs only through cheap array operations.
+    Rules against the bass (P4 is a dissonance and a parallel perfect
+    interval, spacing up to an octave and a major third) are kept apart
+    from rules between upper voices (P4 allowed, adjacent voices within an
+    octave). Melodic rules run on every voice.
+
+    For two voices the findings agree with checking.py on the rules both
+    have, except that P4 against the bass is reported as a dissonance and
+    a measure overlapping in both directions gives one overlap line, not two.
+
+    Args:
+        midi_melodies: Dictionary {voice_name: list of MIDI notes}, highest
+                       voice first and bass last.
+        min_consecutive_moves: Length of a parallel-motion run to report.
+
+    Returns:
+        List of (rule_name, report_string) like checking.run_all_checks;
+        empty if no problems were found.
+    """
+    names, pitches, valid = voices_to_array(midi_melodies)
+    num_voices, length = pitches.shape
+    if num_voices < 2 or length == 0:
+        return []
+
+    upper_pairs, bass_pairs = _pair_masks(num_voices)
+    all_pairs = upper_pairs | bass_pairs
+
+    # Vertical tensors: [i, j, t] is voice i against voice j at position t
+    both_sound = valid[:, None, :] & valid[None, :, :]
+    diff = pitches[:, None, :].astype(np.int32) - pitches[None, :, :]
+    interval_class = np.abs(diff) % 12
+
+    # Melodic motion per voice: [v, t] is the move from t to t+1
+    moves = np.diff(pitches.astype(np.int32), axis=1)
+    move_valid = valid[:, :-1] & valid[:, 1:]
+    direction = np.where(move_valid, np.sign(moves), 0)
+
+    findings = {}
+
+    def pair_name(i, j):
+        return f"{names[i]} and {names[j]}"
+
+    # --- Spacing: adjacent upper voices and lowest upper voice to bass ---
+    adjacent = np.eye(num_voices, k=1, dtype=bool)
+    spacing_limit = np.where(bass_pairs, MAX_BASS_SPACING, MAX_UPPER_SPACING)
+    spacing_pairs = adjacent & all_pairs
+    too_wide = (np.abs(diff) > spacing_limit[:, :, None]) & both_sound & spacing_pairs[:, :, None]
+
+    # --- Voice crossing (any pair); a too-wide pair is reported as such, as in checking.py ---
+    crossing = (diff < 0) & both_sound & all_pairs[:, :, None] & ~too_wide
+    _report(findings, "voice_crossing", [
+        f"mm {t+1} voice crossing between {pair_name(i, j)} ({names[j]} at {pitches[j, t]} is above {names[i]} at {pitches[i, t]})"
+        for i, j, t in _hits(crossing)
+    ])
+    _report(findings, "voice_spacing", [
+        f"mm {t+1} vertical interval too wide between {pair_name(i, j)} (actual: {abs(diff[i, j, t])} semitones, max allowed: {spacing_limit[i, j]})"
+        for i, j, t in _hits(too_wide)
+    ])
+
+    # --- Overlapping between adjacent voices ---
+    if length > 1:
+        lower_above_prev_upper = (pitches[None, :, 1:] > pitches[:, None, :-1]) & valid[None, :, 1:] & valid[:, None, :-1]
+        upper_below_prev_lower = (pitches[:, None, 1:] < pitches[None, :, :-1]) & valid[:, None, 1:] & valid[None, :, :-1]
+        # As in checking.py: only where both voices sound and the pair is neither crossed nor too wide
+        overlap = ((lower_above_prev_upper | upper_below_prev_lower) & both_sound[:, :, 1:]
+                   & ~crossing[:, :, 1:] & ~too_wide[:, :, 1:] & adjacent[:, :, None])
+        _report(findings, "voice_overlapping", [
+            f"mm {t+2} voice overlapping between {pair_name(i, j)}"
+            for i, j, t in _hits(overlap)
+        ])
+
+    # --- Vertical dissonance: against the bass and between upper voices ---
+    dissonant = ((_class_mask(BASS_DISSONANT_INTERVALS)[interval_class] & bass_pairs[:, :, None])
+                 | (_class_mask(UPPER_DISSONANT_INTERVALS)[interval_class] & upper_pairs[:, :, None])) & both_sound
+    _report(findings, "dissonant_interval", [
+        f"mm {t+1} dissonant vertical interval between {pair_name(i, j)}: "
+        f"{(BASS_DISSONANT_INTERVALS if bass_pairs[i, j] else UPPER_DISSONANT_INTERVALS)[interval_class[i, j, t]]}"
+        for i, j, t in _hits(dissonant)
+    ])
+
+    if length > 1:
+        # Similar motion of both voices of a pair: [i, j, t]
+        similar = (direction[:, None, :] == direction[None, :, :]) & (direction[:, None, :] != 0)
+
+        # --- Parallel perfect intervals ---
+        perfect = ((_class_mask(BASS_PERFECT_INTERVALS)[interval_class] & bass_pairs[:, :, None])
+                   | (_class_mask(PERFECT_INTERVALS)[interval_class] & upper_pairs[:, :, None])) & both_sound
+        parallel = (perfect[:, :, :-1] & perfect[:, :, 1:]
+                    & (interval_class[:, :, :-1] == interval_class[:, :, 1:]) & similar)
+        _report(findings, "parallel_perfect_intervals", [
+            f"mm {t+1}-{t+2} parallel perfect interval between {pair_name(i, j)}"
+            for i, j, t in _hits(parallel)
+        ])
+
+        # --- Parallel motives: min_consecutive_moves similar moves in a row ---
+        runs = _runs_of(similar & all_pairs[:, :, None], min_consecutive_moves)
+        _report(findings, "parallel_motives", [
+            f"mm {t+1}-{t+min_consecutive_moves+1} parallel motives between {pair_name(i, j)}"
+            for i, j, t in _hits(runs)
+        ])
+
+        # --- Melodic rules on every voice ---
+        leap = np.abs(moves)
+        leap_lines = []
+        for v, t in zip(*np.nonzero(move_valid & (np.isin(leap, list(PROBLEMATIC_LEAPS)) | (leap > 12)))):
+            size = int(leap[v, t])
+            kind = f"Dissonant melodic movement of {PROBLEMATIC_LEAPS[size]}" if size in PROBLEMATIC_LEAPS \
+                else f"Very large leap of {size} semitones"
+            leap_lines.append(f"mm {t+1}-{t+2} in {names[v]}: {kind}")
+        _report(findings, "dissonant_leaps", leap_lines)
+
+        _report(findings, "repeated_notes", [
+            f"mm {t+1}-{t+2} in {names[v]}: Note {pitches[v, t]} is repeated consecutively."
+            for v, t in zip(*np.nonzero(move_valid & (moves == 0)))
+        ])
+
+    return [(rule, "\n".join(lines)) for rule, lines in findings.items()]
+
+
+if __name__ == "__main__":
+    example = {
+        "Soprano": [76, 77, 79, 79, 77, 76, 74, 76],
+        "Alto": [72, 74, 72, 71, 72, 72, 71, 72],
+        "Counterpoint": [67, 69, 67, 67, 69, 67, 67, 67],
+        "CantusFirmus": [60, 62, 64, 62, 65, 64, 62, 60],
+    }
+    for rule, report in check_voices(example):
+        print(f"[{rule}]\n{report}")
@@ -0,0 +1,184 @@
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from checking import RULES, run_all_checks, run_rule
+from multi_voice import REST, check_voices, voices_to_array
+
+MIN_CHUNK_MEASURES = 2000   # below this, process start-up costs more than it saves
+CHUNKS_PER_WORKER = 4       # a few chunks per worker keeps the load balanced
+CONTEXT_BEFORE = 1          # overlapping, key adherence (minor) look at the previous measure
+# Whole-score rules; everything else only looks at a few neighbouring measures.
+# octave_unison is chunk-safe: a chunk's own first/last measure is only a real
+# start or end where the score's is, and findings elsewhere are dropped as context.
+GLOBAL_RULES = {"melody_characteristics"}
+MULTI_VOICE_RULES = ["voice_crossing", "voice_spacing", "voice_overlapping", "dissonant_interval",
+                     "parallel_perfect_intervals", "parallel_motives", "dissonant_leaps", "repeated_notes"]
+MEASURE_PATTERN = re.compile(r"^mm (\d+)(?:-(\d+))?")
+VOICE_PATTERN = re.compile(r" in (.+?): ")
+
+_worker = {}   # shared memory and pitch view of the score, per worker process
+
+
+def _attach(shm_name, shape, names):
+    # Pool workers share the parent's resource tracker; the parent unlinks the block
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["pitches"] = np.ndarray(shape, dtype=np.int16, buffer=shm.buf)
+    _worker["names"] = names
+
+
+def _voice_lists(start, end):
+    return [[None if p == REST else p for p in row] for row in _worker["pitches"][:, start:end].tolist()]
+
+
+def _check_chunk(start, end, owned_start, owned_end, key_root, is_minor, min_consecutive_moves):
+    """
+    Check measures start..end-1 of the shared score and keep the findings
+    whose first measure lies in owned_start..owned_end-1, renumbered to
+    measures of the whole score.
+    """
+    voices = _voice_lists(start, end)
+    if len(voices) == 2:
+        findings = []
+        for rule_name, _, _ in RULES:
+            if rule_name not in GLOBAL_RULES:
+                report = run_rule(rule_name, voices[0], voices[1], key_root, is_minor)
+                if report is not None:
+                    findings.append((rule_name, report))
+    else:
+        findings = check_voices(dict(zip(_worker["names"], voices)), min_consecutive_moves)
+
+    kept = []
+    for rule_name, report in findings:
+        lines = []
+        for line in report.splitlines():
+            match = MEASURE_PATTERN.match(line)
+            if not match:
+                continue
+            first = int(match.group(1)) + start
+            if not owned_start < first <= owned_end:
+                continue  # found again by the chunk that owns it
+            renumbered = f"mm {first}" if match.group(2) is None else f"mm {first}-{int(match.group(2)) + start}"
+            lines.append(renumbered + line[match.end():])
+        if lines:
+            kept.append((rule_name, lines))
+    return kept
+
+
+def _check_global(key_root, is_minor):
+    voices = _voice_lists(0, _worker["pitches"].shape[1])
+    findings = []
+    for rule_name in GLOBAL_RULES:
+        report = run_rule(rule_name, voices[0], voices[1], key_root, is_minor)
+        if report is not None:
+            findings.append((rule_name, report.splitlines()))
+    return findings
+
+
+def plan_chunks(length, chunk_measures, context_after):
+    """
+    Split measures 0..length-1 into owned ranges of chunk_measures and
+    widen each by the context its findings need.
+
+    Returns:
+        List of (start, end, owned_start, owned_end), 0-based, end exclusive.
+    """
+    chunks = []
+    for owned_start in range(0, length, chunk_measures):
+        owned_end = min(owned_start + chunk_measures, length)
+        chunks.append((max(owned_start - CONTEXT_BEFORE, 0), min(owned_end + context_after, length),
+                       owned_start, owned_end))
+    return chunks
+
+
+def check_score_parallel(midi_melodies, key_root=60, is_minor=False, workers=None, chunk_measures=None,
+                         min_consecutive_moves=3):
+    """
+    Check one long score on several processes.
+
+    The score is copied once into shared memory and split into measure
+    chunks; each chunk is checked with enough neighbouring measures on both
+    sides for every window that starts in it (previous measure, and
+    min_consecutive_moves measures after for parallel motives). Every finding
+    is kept only by the chunk its first measure belongs to, so the merged
+    result has no duplicates. Rules that need the whole melody run as one
+    more task next to the chunks.
+
+    Two voices (counterpoint first, cantus firmus second) get the rules of
+    checking.py and the same result as run_all_checks; more voices get
+    multi_voice.check_voices. Short scores, or workers=1, are checked in
+    this process.
+
+    Args:
+        midi_melodies: Dictionary {voice_name: list of MIDI notes}, highest voice first.
+        workers: Number of processes (default: os.cpu_count()).
+        chunk_measures: Measures owned by each chunk (default: about
+                        CHUNKS_PER_WORKER chunks per worker, at least MIN_CHUNK_MEASURES).
+
+    Returns:
+        List of (rule_name, report_string) like checking.run_all_checks.
+    """
+    names = list(midi_melodies)
+    voices = list(midi_melodies.values())
+    two_voices = len(voices) == 2
+    length = max((len(voice) for voice in voices), default=0)
+    workers = workers or os.cpu_count() or 1
+    if chunk_measures is None:
+        chunk_measures = max(MIN_CHUNK_MEASURES, math.ceil(length / (workers * CHUNKS_PER_WORKER)))
+
+    if workers == 1 or length <= chunk_measures or (two_voices and len(voices[0]) != len(voices[1])):
+        if two_voices:
+            return run_all_checks(voices[0], voices[1], key_root, is_minor)
+        return check_voices(midi_melodies, min_consecutive_moves)
+
+    _, pitches, _ = voices_to_array(midi_melodies)
+    shm = shared_memory.SharedMemory(create=True, size=max(pitches.nbytes, 1))
+    try:
+        np.ndarray(pitches.shape, dtype=np.int16, buffer=shm.buf)[:] = pitches
+        context_after = 3 if two_voices else min_consecutive_moves   # checking.py uses 3 moves
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shm.name, pitches.shape, names)) as pool:
+            global_future = pool.submit(_check_global, key_root, is_minor) if two_voices else None
+            chunk_futures = [pool.submit(_check_chunk, *chunk, key_root, is_minor, min_consecutive_moves)
+                             for chunk in plan_chunks(length, chunk_measures, context_after)]
+            merged = {}
+            for future in chunk_futures:
+                for rule_name, lines in future.result():
+                    merged.setdefault(rule_name, []).extend(lines)
+            if global_future is not None:
+                for rule_name, lines in global_future.result():
+                    merged.setdefault(rule_name, []).extend(lines)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if two_voices:
+        order = [rule_name for rule_name, _, _ in RULES]
+    else:
+        order = MULTI_VOICE_RULES
+        # check_voices lists melodic findings voice by voice
+        for rule_name in ("dissonant_leaps", "repeated_notes"):
+            if rule_name in merged:
+                merged[rule_name].sort(key=lambda line: (names.index(VOICE_PATTERN.search(line).group(1)),
+                                                         int(MEASURE_PATTERN.match(line).group(1))))
+    return [(rule_name, "\n".join(merged[rule_name])) for rule_name in order if rule_name in merged]
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    rng = random.Random(0)
+    length = 200000
+    score = {"Counterpoint": [rng.choice([67, 69, 71, 72, 74, 76, 77, 79]) for _ in range(length)],
+             "CantusFirmus": [rng.choice([55, 57, 59, 60, 62, 64, 65]) for _ in range(length)]}
+    for workers in sorted({1, os.cpu_count() or 1}):
+        started = time.perf_counter()
+        findings = check_score_parallel(score, workers=workers)
+        print(f"{workers} worker(s): {time.perf_counter() - started:.2f}s, "
+              f"{sum(report.count(chr(10)) + 1 for _, report in findings)} findings")
@@ -0,0 +1,265 @@
+import json
+import os
+import sys
+import threading
+import time
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from get_melody import send_to_llm, MODEL, BASE_URL
+
+# (model, base_url) pairs that take part in a race. The first entry is the
+# configured default from get_melody.py.
+MODEL_ENDPOINTS = [
+    (MODEL, BASE_URL),
+    ("google/gemini-2.5-pro-preview", "https://openrouter.ai/api/v1"),
+    ("openai/o3-mini", "https://openrouter.ai/api/v1"),
+    ("deepseek/deepseek-r1-0528-qwen3-8b:free", "https://openrouter.ai/api/v1"),
+]
+
+STATS_FILE = os.path.join("result", "model_stats.json")
+
+
+class ModelStats:
+    """
+    Rolling latency and pass-rate statistics per (model, base_url).
+
+    Only the last `window` runs of each model are kept, so a provider that
+    got faster (or broke) is picked up quickly. Racers cancelled because
+    another model won are kept as censored samples: the time they had run
+    is a lower bound on their latency. Safe to share between the threads
+    of a race.
+    """
+
+    def __init__(self, window=20):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._outcomes = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._censored = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+
+    @staticmethod
+    def _key(model, base_url):
+        return f"{model}@{base_url}"
+
+    def record(self, model, base_url, latency, passed):
+        """Record one finished (not cancelled) run."""
+        key = self._key(model, base_url)
+        with self._lock:
+            self._outcomes[key].append(bool(passed))
+            if passed:
+                self._latencies[key].append(latency)
+
+    def record_cancelled(self, model, base_url, elapsed):
+        """Record a run cancelled after `elapsed` seconds because another model was first."""
+        with self._lock:
+            self._censored[self._key(model, base_url)].append(elapsed)
+
+    def samples(self, model, base_url):
+        """Number of finished runs in the window (cancelled runs are not counted)."""
+        with self._lock:
+            return len(self._outcomes.get(self._key(model, base_url), ()))
+
+    def cancelled(self, model, base_url):
+        with self._lock:
+            return len(self._censored.get(self._key(model, base_url), ()))
+
+    def has_data(self, model, base_url):
+        return self.samples(model, base_url) > 0 or self.cancelled(model, base_url) > 0
+
+    def pass_rate(self, model, base_url):
+        """Fraction of recent runs that passed all checks, or None without data."""
+        with self._lock:
+            outcomes = self._outcomes.get(self._key(model, base_url))
+            if not outcomes:
+                return None
+            return sum(outcomes) / len(outcomes)
+
+    def mean_latency(self, model, base_url):
+        """Mean seconds per accepted melody over the window, or None without data."""
+        with self._lock:
+            latencies = self._latencies.get(self._key(model, base_url))
+            if not latencies:
+                return None
+            return sum(latencies) / len(latencies)
+
+    def expected_latency(self, model, base_url):
+        """
+        Expected wall time to get one accepted melody from this model, or
+        None without data.
+
+        Accepted latencies and the lower bounds of cancelled runs are
+        pooled as censored samples (total time observed per accepted
+        melody, at least one), then divided by the pass rate of the
+        finished runs. A model that keeps losing races therefore gets a
+        growing estimate instead of staying unknown.
+        """
+        key = self._key(model, base_url)
+        with self._lock:
+            latencies = list(self._latencies.get(key, ()))
+            censored = list(self._censored.get(key, ()))
+        rate = self.pass_rate(model, base_url)
+        if rate is None and not censored:
+            return None
+        if rate == 0:
+            return float("inf")
+        return (sum(latencies) + sum(censored)) / max(len(latencies), 1) / (1.0 if rate is None else rate)
+
+    def summary(self):
+        """Return {key: {"samples", "pass_rate", "mean_latency"}} for reporting."""
+        with self._lock:
+            keys = list(dict.fromkeys(list(self._outcomes) + list(self._censored)))
+        report = {}
+        for key in keys:
+            model, base_url = key.split("@", 1)
+            report[key] = {
+                "samples": self.samples(model, base_url),
+                "cancelled": self.cancelled(model, base_url),
+                "pass_rate": self.pass_rate(model, base_url),
+                "mean_latency": self.mean_latency(model, base_url),
+            }
+        return report
+
+    def save(self, path=STATS_FILE):
+        with self._lock:
+            data = {
+                "window": self.window,
+                "latencies": {k: list(v) for k, v in self._latencies.items()},
+                "outcomes": {k: list(v) for k, v in self._outcomes.items()},
+                "censored": {k: list(v) for k, v in self._censored.items()},
+            }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path=STATS_FILE, window=20):
+        """Load statistics saved by `save`; returns empty stats if the file is missing."""
+        stats = cls(window=window)
+        if not os.path.exists(path):
+            return stats
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Warning: could not read model stats from {path}: {e}", file=sys.stderr)
+            return stats
+        for key, values in data.get("latencies", {}).items():
+            stats._latencies[key].extend(values)
+        for key, values in data.get("outcomes", {}).items():
+            stats._outcomes[key].extend(values)
+        for key, values in data.get("censored", {}).items():
+            stats._censored[key].extend(values)
+        return stats
+
+
+def order_endpoints(endpoints, stats, max_racers=None, min_pass_rate=0.1, min_samples=5):
+    """
+    Order endpoints by expected latency per accepted melody and prune the
+    ones that keep failing.
+
+    A model is dropped once it has at least `min_samples` runs and its pass
+    rate is below `min_pass_rate`. At least one endpoint is always kept.
+    Models without data share a single exploration slot (in the given
+    order), so the best model with data always races.
+    """
+    known = sorted((e for e in endpoints if stats.has_data(*e)), key=lambda e: stats.expected_latency(*e))
+    unknown = [e for e in endpoints if not stats.has_data(*e)]
+    kept = []
+    for model, base_url in known:
+        rate = stats.pass_rate(model, base_url)
+        if rate is not None and stats.samples(model, base_url) >= min_samples and rate < min_pass_rate:
+            print(f"Pruning {model} from race (pass rate {rate:.0%}).")
+            continue
+        kept.append((model, base_url))
+    if not kept and known and not unknown:
+        kept = known[:1]
+    if max_racers is None:
+        return kept + unknown
+    if not kept:
+        return unknown[:max_racers]
+    explore = unknown[:1] if max_racers > 1 else []
+    return kept[:max_racers - len(explore)] + explore
+
+
+def race_models(conterpoint, endpoints=None, stats=None, max_racers=3, max_attempts=5,
+                initial_comments="", min_pass_rate=0.1, min_samples=5):
+    """
+    Send the same cantus firmus to several models at once and keep the first
+    melody that passes all checks.
+
+    Once a winner is found the other racers are cancelled: they stop before
+    their next attempt (a request already in flight is left to finish and
+    its result is discarded). Each cancelled racer is recorded in `stats`
+    as not first, with the winner's time as a lower bound on its latency.
+
+    Returns:
+        - Tuple (result, midi_melodies, model) of the winner.
+        - ("Failed Output", None, None) if no racer produced a passing melody.
+    """
+    if endpoints is None:
+        endpoints = MODEL_ENDPOINTS
+    if stats is None:
+        stats = ModelStats()
+
+    racers = order_endpoints(endpoints, stats, max_racers=max_racers,
+                             min_pass_rate=min_pass_rate, min_samples=min_samples)
+    print(f"Racing {len(racers)} models: {[m for m, _ in racers]}")
+
+    cancel_event = threading.Event()
+    start_time = time.monotonic()
+    settled = set()   # racers whose run is already in stats
+    settled_lock = threading.Lock()
+
+    def settle(endpoint, record):
+        with settled_lock:
+            if endpoint in settled:
+                return
+            settled.add(endpoint)
+        record()
+
+    def run(model, base_url):
+        result, midi_melodies = send_to_llm(conterpoint, initial_comments=initial_comments,
+                                            max_attempts=max_attempts, use_checking=True,
+                                            model=model, base_url=base_url,
+                                            cancel_event=cancel_event)
+        latency = time.monotonic() - start_time
+        if result == "Cancelled":
+            settle((model, base_url), lambda: stats.record_cancelled(model, base_url, latency))
+        else:
+            settle((model, base_url), lambda: stats.record(model, base_url, latency, result == "Successful Output"))
+        return result, midi_melodies, latency
+
+    executor = ThreadPoolExecutor(max_workers=len(racers))
+    futures = {executor.submit(run, model, base_url): (model, base_url) for model, base_url in racers}
+    winner = ("Failed Output", None, None)
+    try:
+        for future in as_completed(futures):
+            model = futures[future][0]
+            try:
+                result, midi_melodies, latency = future.result()
+            except Exception as e:
+                print(f"Racer {model} raised: {e}", file=sys.stderr)
+                settle(futures[future], lambda: None)
+                continue
+            if result == "Successful Output" and midi_melodies:
+                print(f"{model} won the race in {latency:.1f}s.")
+                winner = (result, midi_melodies, model)
+                cancel_event.set()
+                for endpoint in futures.values():
+                    settle(endpoint, lambda endpoint=endpoint: stats.record_cancelled(*endpoint, latency))
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return winner
+
+
+if __name__ == "__main__":
+    stats = ModelStats.load()
+    result, midi_melodies, model = race_models(
+        r"'CantusFirmus': [60, 62, 65, 64, 65, 67, 69, 67, 64, 62, 60]", stats=stats)
+    print(result, model, midi_melodies)
+    stats.save()
+    print(json.dumps(stats.summary(), indent=2))
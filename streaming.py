@@ -0,0 +1,231 @@
+import collections
+import math
+
+MAX_ALLOWED_INTERVAL = 16
+PERFECT_INTERVAL_TYPES = (0, 5, 7)
+PROBLEMATIC_LEAPS_INFO = {
+    6: "Tritone (6s, e.g., Aug4/Dim5)",
+    10: "10s (e.g., m7/Aug6)",
+    11: "11s (e.g., M7/Dim8)",
+}
+DISSONANT_INTERVALS = {1: "minor second", 2: "major second", 6: "tritone", 10: "minor seventh", 11: "major seventh"}
+MAJOR_SCALE = (0, 2, 4, 5, 7, 9, 11)
+NATURAL_MINOR_SCALE = (0, 2, 3, 5, 7, 8, 10)
+MELODIC_MINOR_ASCENDING_SCALE = (0, 2, 3, 5, 7, 9, 11)
+NOTE_NAMES = ["C", "C#/Db", "D", "D#/Eb", "E", "F", "F#/Gb", "G", "G#/Ab", "A", "A#/Bb", "B"]
+MAX_REPORTED_POSITIONS = 10  # apex positions kept for the report
+
+
+def _direction(note1, note2):
+    if note1 is None or note2 is None:
+        return None
+    return (note2 > note1) - (note2 < note1)
+
+
+class StreamingChecker:
+    """
+    Checks a counterpoint/cantus firmus pair one measure at a time.
+
+    `feed(cp_note, cf_note)` returns the findings whose window closes at that
+    measure, as (rule_name, message) pairs with the same rule names as
+    checking.py. `finish()` returns the findings that need the whole melody
+    (final octave/unison, note variety, apex).
+
+    Only a fixed amount of state is kept, whatever the length of the melody:
+    the previous measure, the current parallel-motion run, a pitch histogram
+    (at most 128 entries) and the apex so far. Message text matches
+    checking.py except where that would need the whole melody: Note Variety
+    leaves out the "(at melody positions: [...])" list, and apex positions
+    beyond MAX_REPORTED_POSITIONS are counted ("... and N more") but not
+    listed.
+    """
+
+    def __init__(self, key_root=60, is_minor=False, min_consecutive_moves=3):
+        self.key_root = key_root
+        self.is_minor = is_minor
+        self.min_consecutive_moves = min_consecutive_moves
+        self.key_name = NOTE_NAMES[key_root % 12] + (" minor" if is_minor else " major")
+
+        self.length = 0
+        self.prev_cp = None
+        self.prev_cf = None
+        self.parallel_run = 0
+        self.pending_octave = None   # measure with an octave/unison, unless it turns out to be the last
+        self.last_pair = (None, None)
+
+        self.note_counts = collections.Counter()
+        self.apex = None
+        self.apex_count = 0
+        self.apex_positions = []
+
+    def feed(self, cp_note, cf_note):
+        """Add the next measure; returns the findings completed by it."""
+        findings = []
+        i = self.length            # 0-based index of this measure
+        measure = i + 1
+        prev_cp, prev_cf = self.prev_cp, self.prev_cf
+
+        # Octave/unison seen in the previous measure is now known not to be the last one
+        if self.pending_octave is not None:
+            findings.append(("octave_unison", f"mm {self.pending_octave} contains octave/unison vertical interval "
+                                              f"which is only allowed at beginning and end"))
+            self.pending_octave = None
+
+        if i > 0:
+            # Parallel perfect intervals
+            if None not in (prev_cp, prev_cf, cp_note, cf_note):
+                type_prev = abs(prev_cp - prev_cf) % 12
+                type_now = abs(cp_note - cf_note) % 12
+                if type_prev in PERFECT_INTERVAL_TYPES and type_prev == type_now:
+                    dir1, dir2 = cp_note - prev_cp, cf_note - prev_cf
+                    if dir1 != 0 and dir2 != 0 and (dir1 > 0) == (dir2 > 0):
+                        findings.append(("parallel_perfect_intervals", f"mm {i}-{measure} find out parallel perfect interval"))
+
+            # Parallel motives: run of similar moves ending here
+            dir1, dir2 = _direction(prev_cp, cp_note), _direction(prev_cf, cf_note)
+            if dir1 is not None and dir2 is not None and dir1 != 0 and dir1 == dir2:
+                self.parallel_run += 1
+            else:
+                self.parallel_run = 0
+            if self.parallel_run >= self.min_consecutive_moves:
+                findings.append(("parallel_motives",
+                                 f"mm {measure - self.min_consecutive_moves}-{measure} find out parallel motives"))
+
+        # Voice spacing, crossing and overlapping
+        if cp_note is not None and cf_note is not None:
+            interval = abs(cp_note - cf_note)
+            if interval > MAX_ALLOWED_INTERVAL:
+                findings.append(("voice_spacing", f"mm {measure} vertical interval too wide (actual: {interval} semitones, "
+                                                  f"max allowed: {MAX_ALLOWED_INTERVAL})"))
+            elif cf_note > cp_note:
+                findings.append(("voice_spacing", f"mm {measure} voice crossing (lower voice at {cf_note} is above "
+                                                  f"upper voice at {cp_note})"))
+            elif i > 0:
+                if prev_cp is not None and cf_note > prev_cp:
+                    findings.append(("voice_spacing", f"mm {measure} voice overlapping (lower voice at {cf_note} is above previous "
+                                                      f"upper voice note at {prev_cp}, consider raise an octave or change a note in conterpoint)"))
+                if prev_cf is not None and cp_note < prev_cf:
+                    findings.append(("voice_spacing", f"mm {measure} voice overlapping (upper voice at {cp_note} is below previous "
+                                                      f"lower voice note at {prev_cf}, consider lower an octave or change a note in conterpoint)"))
+
+        # Melodic rules on the counterpoint
+        if i > 0 and prev_cp is not None and cp_note is not None:
+            leap = abs(prev_cp - cp_note)
+            if leap in PROBLEMATIC_LEAPS_INFO:
+                findings.append(("dissonant_leaps", f"mm {i}-{measure} in Connterpoint: Dissonant melodic movement of "
+                                                    f"{PROBLEMATIC_LEAPS_INFO[leap]}"))
+            elif leap > 12:
+                findings.append(("dissonant_leaps", f"mm {i}-{measure} in Connterpoint: Very large leap of {leap} semitones"))
+            if leap == 0:
+                findings.append(("repeated_notes", f"mm {i}-{measure} in Counterpoint: Note {prev_cp} is repeated consecutively."))
+
+        # Vertical dissonance and octaves/unisons in the middle
+        if cp_note is not None and cf_note is not None:
+            interval_type = abs(cp_note - cf_note) % 12
+            if interval_type in DISSONANT_INTERVALS:
+                findings.append(("dissonant_interval", f"mm {measure} dissonant vertical interval: {DISSONANT_INTERVALS[interval_type]}"))
+            if interval_type == 0 and i > 0:
+                self.pending_octave = measure
+
+        # Key adherence
+        if cp_note is not None:
+            degree = (cp_note - self.key_root) % 12
+            note_name = NOTE_NAMES[cp_note % 12]
+            if self.is_minor:
+                ascending = i > 0 and prev_cp is not None and cp_note > prev_cp
+                scale = MELODIC_MINOR_ASCENDING_SCALE if ascending else NATURAL_MINOR_SCALE
+                if degree not in scale:
+                    findings.append(("key_adherence", f"mm {measure} note {note_name} (MIDI {cp_note}) is not in {self.key_name} scale "
+                                                      f"(used {'melodic ascending' if ascending else 'natural minor'})"))
+            elif degree not in MAJOR_SCALE:
+                findings.append(("key_adherence", f"mm {measure} note {note_name} (MIDI {cp_note}) is not in {self.key_name} scale"))
+
+            # Running state for the global rules
+            self.note_counts[cp_note] += 1
+            if self.apex is None or cp_note > self.apex:
+                self.apex, self.apex_count, self.apex_positions = cp_note, 1, [measure]
+            elif cp_note == self.apex:
+                self.apex_count += 1
+                if len(self.apex_positions) < MAX_REPORTED_POSITIONS:
+                    self.apex_positions.append(measure)
+
+        self.prev_cp, self.prev_cf = cp_note, cf_note
+        self.last_pair = (cp_note, cf_note)
+        self.length += 1
+        return findings
+
+    def finish(self):
+        """End of stream: returns the final-measure, note variety and apex findings."""
+        findings = []
+        length = self.length
+        if length >= 2:
+            # A pending octave/unison in the last measure is where it belongs
+            self.pending_octave = None
+            last_cp, last_cf = self.last_pair
+            if last_cp is not None and last_cf is not None and abs(last_cp - last_cf) % 12 != 0:
+                findings.append(("octave_unison", f"mm {length} (final measure) does not end with octave or unison interval"))
+
+        if length == 0 or self.apex is None:
+            findings.append(("melody_characteristics", "Melody is empty. Compose a melody first with notes."))
+            return findings
+
+        num_actual_notes = sum(self.note_counts.values())
+        for note_pitch, count in self.note_counts.items():
+            percentage = (count / num_actual_notes) * 100
+            if percentage > 40:
+                findings.append(("melody_characteristics",
+                                 f"Note Variety: Pitch {note_pitch} occurs too frequently, "
+                                 f"occupying {percentage:.1f}%% of the {num_actual_notes} actual notes. "
+                                 f"Maximum allowed is 40%%."))
+
+        positions = self.apex_positions
+        if self.apex_count > len(positions):
+            positions = f"{positions} and {self.apex_count - len(positions)} more"
+        if self.apex_count > 1:
+            findings.append(("melody_characteristics",
+                             f"Apex: Multiple occurrences of the highest note ({self.apex}) "
+                             f"found at melody positions {positions}. "
+                             f"There should be only one apex in the melody."))
+        else:
+            window_start_idx = math.floor(length * 0.5)
+            window_end_idx = math.floor(length * 0.9)
+            if not window_start_idx <= self.apex_positions[0] - 1 <= window_end_idx:
+                findings.append(("melody_characteristics",
+                                 f"Apex: The highest note ({self.apex}, found at melody positions {positions}) "
+                                 f"does not occur within the 50-90 percent target window "
+                                 f"(melody positions {window_start_idx + 1}-{window_end_idx + 1} of {length} total items)."))
+        return findings
+
+
+def check_stream(pairs, key_root=60, is_minor=False):
+    """
+    Yield (rule_name, message) findings for an iterable of (cp_note, cf_note)
+    pairs as soon as each one is known; the whole-melody verdicts come last.
+    """
+    checker = StreamingChecker(key_root=key_root, is_minor=is_minor)
+    for cp_note, cf_note in pairs:
+        yield from checker.feed(cp_note, cf_note)
+    yield from checker.finish()
+
+
+def collect_findings(findings):
+    """
+    Group streamed findings per rule into the (rule_name, report_string)
+    list that checking.run_all_checks returns. Holds all messages, so use it
+    for melodies of normal length only.
+    """
+    grouped = collections.OrderedDict()
+    for rule_name, message in findings:
+        grouped.setdefault(rule_name, []).append(message)
+    return [(rule_name, "\n".join(messages)) for rule_name, messages in grouped.items()]
+
+
+if __name__ == "__main__":
+    import itertools
+    import random
+
+    # An endless random line, checked in constant memory; stop after 20 findings.
+    rng = random.Random(0)
+    live = ((rng.choice([72, 74, 76, 77, 79]), rng.choice([60, 62, 64, 65, 67])) for _ in itertools.count())
+    for rule_name, message in itertools.islice(check_stream(live), 20):
+        print(f"[{rule_name}] {message}")
@@ -0,0 +1,182 @@
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned answers for the default cantus firmus [60, 62, 65, 64, 65, 67, 69, 67, 64, 62, 60].
+CANTUS_FIRMUS = [60, 62, 65, 64, 65, 67, 69, 67, 64, 62, 60]
+VALID_COUNTERPOINT = [72, 67, 74, 71, 69, 74, 72, 71, 72, 77, 72]    # passes every check
+INVALID_COUNTERPOINT = [79, 83, 81, 83, 72, 76, 84, 83, 79, 77, 79]  # the prompt example, fails
+
+DEFAULT_SCRIPT = ["invalid", "valid", "malformed", "valid"]
+
+
+class StubConfig:
+    """
+    Behaviour of the stub server.
+
+    Args:
+        latency: Seconds to wait before answering, or a (min, max) tuple for
+                 a uniformly random delay.
+        error_rate: Probability (0-1) of answering with an HTTP error instead.
+        error_status: Status code used for those errors (429 adds Retry-After).
+        script: Sequence of "valid", "invalid" and "malformed" answers,
+                served in a cycle shared by all clients.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=500, script=None, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.script = list(script or DEFAULT_SCRIPT)
+        self._cycle = itertools.cycle(self.script)
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    def next_answer(self):
+        with self._lock:
+            self.requests += 1
+            return next(self._cycle)
+
+    def should_fail(self):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def delay(self):
+        if isinstance(self.latency, (tuple, list)):
+            with self._lock:
+                return self._random.uniform(*self.latency)
+        return self.latency
+
+
+def _melody_json(kind, exercise_id=None):
+    counterpoint = VALID_COUNTERPOINT if kind == "valid" else INVALID_COUNTERPOINT
+    item = {"Counterpoint": counterpoint, "CantusFirmus": CANTUS_FIRMUS}
+    if exercise_id is not None:
+        item = {"id": exercise_id, **item}
+    return json.dumps(item)
+
+
+def build_answer(kind, prompt):
+    """
+    Build the assistant message for one scripted answer.
+
+    Batched prompts (with "Exercise id ..." lines, see send_batch_to_llm)
+    get a keyed JSON array with one item per exercise.
+    """
+    if kind == "malformed":
+        return "Here is a lovely counterpoint: Counterpoint = [72, 67, 74, ..."
+
+    exercise_ids = re.findall(r"Exercise id (\S+):", prompt)
+    if exercise_ids:
+        body = "[" + ", ".join(_melody_json(kind, exercise_id) for exercise_id in exercise_ids) + "]"
+    else:
+        body = _melody_json(kind)
+    return f"```json\n{body}\n```"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /chat/completions endpoint."""
+
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+
+        config = self.config
+        time.sleep(config.delay())
+
+        if config.should_fail():
+            headers = {"Retry-After": "0.05"} if config.error_status == 429 else None
+            self._send_json(config.error_status, {"error": {"message": "stub error"}}, headers)
+            return
+
+        prompt = "\n".join(m.get("content") or "" for m in request.get("messages", []))
+        content = build_answer(config.next_answer(), prompt)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        self._send_json(200, {
+            "id": f"stub-{config.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def start_stub_server(host="127.0.0.1", port=0, config=None):
+    """
+    Start the stub server in a daemon thread.
+
+    Returns:
+        Tuple (server, base_url); call server.shutdown() to stop it.
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1"
+    return server, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--script", default=",".join(DEFAULT_SCRIPT),
+                        help="comma separated list of valid/invalid/malformed")
+    args = parser.parse_args()
+
+    config = StubConfig(latency=args.latency, error_rate=args.error_rate,
+                        error_status=args.error_status, script=args.script.split(","))
+    server, base_url = start_stub_server(args.host, args.port, config)
+    print(f"Stub server listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
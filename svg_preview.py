@@ -0,0 +1,153 @@
+import os
+import re
+from xml.sax.saxutils import escape
+
+from checking import run_all_checks
+
+MEASURE_WIDTH = 36
+SEMITONE_HEIGHT = 4
+MARGIN = 30
+NOTE_HEIGHT = 7
+TREBLE_LINES = (64, 67, 71, 74, 77)   # E4 G4 B4 D5 F5
+BASS_LINES = (43, 47, 50, 53, 57)     # G2 B2 D3 F3 A3
+VOICE_COLOURS = ("#1f5fa8", "#2e8b3c", "#8a4fb3", "#b36b00")
+FLAG_COLOUR = "#d62728"
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+# Rules that only look at the counterpoint; the others concern both voices.
+COUNTERPOINT_ONLY_RULES = {"dissonant_leaps", "repeated_notes", "key_adherence", "melody_characteristics"}
+
+
+def flagged_measures(findings, voice_names=("Counterpoint", "CantusFirmus")):
+    """
+    Work out which notes the findings point at.
+
+    Args:
+        findings: List of (rule_name, report_string) as returned by run_all_checks.
+
+    Returns:
+        Dictionary {(voice_name, measure): [messages]} with 1-based measures,
+        read from "mm X", "mm X-Y" and "positions [...]" / "positions: [...]" in the reports.
+    """
+    flagged = {}
+    for rule_name, report in findings:
+        voices = voice_names[:1] if rule_name in COUNTERPOINT_ONLY_RULES else voice_names
+        for line in report.splitlines():
+            measures = set()
+            for start, end in re.findall(r"mm (\d+)(?:-(\d+))?", line):
+                measures.update(range(int(start), int(end or start) + 1))
+            for group in re.findall(r"positions:? \[([\d, ]+)\]", line):
+                measures.update(int(x) for x in group.split(",") if x.strip())
+            for measure in measures:
+                for voice in voices:
+                    flagged.setdefault((voice, measure), []).append(line)
+    return flagged
+
+
+def render_svg(midi_melodies, findings=None, title=""):
+    """
+    Draw the voices of a melody dict as a piano roll over treble and bass
+    staff lines and return the SVG document as a string.
+
+    Notes named by the findings are drawn in red and their measures shaded;
+    hovering a note shows its pitch and the messages about it.
+
+    Args:
+        midi_melodies: Dictionary {voice_name: list of MIDI notes (None for rests)}.
+        findings: Optional list of (rule_name, report_string), e.g. from run_all_checks.
+        title: Optional caption drawn above the roll.
+    """
+    voice_names = list(midi_melodies)
+    flagged = flagged_measures(findings or [], tuple(voice_names))
+    notes = [n for voice in midi_melodies.values() for n in voice if n is not None]
+    low = min(notes + list(BASS_LINES)) - 2
+    high = max(notes + list(TREBLE_LINES)) + 2
+    length = max((len(voice) for voice in midi_melodies.values()), default=0)
+
+    width = 2 * MARGIN + max(length, 1) * MEASURE_WIDTH
+    height = 2 * MARGIN + (high - low) * SEMITONE_HEIGHT
+
+    def y_of(pitch):
+        return MARGIN + (high - pitch) * SEMITONE_HEIGHT
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="10">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+    ]
+    if title:
+        parts.append(f'<text x="{MARGIN}" y="{MARGIN - 12}" font-size="12">{escape(title)}</text>')
+
+    flagged_columns = sorted({measure for _, measure in flagged})
+    for measure in flagged_columns:
+        if 1 <= measure <= length:
+            x = MARGIN + (measure - 1) * MEASURE_WIDTH
+            parts.append(f'<rect x="{x}" y="{MARGIN}" width="{MEASURE_WIDTH}" height="{height - 2 * MARGIN}" '
+                         f'fill="{FLAG_COLOUR}" fill-opacity="0.08"/>')
+
+    for pitch in TREBLE_LINES + BASS_LINES:
+        y = y_of(pitch)
+        parts.append(f'<line x1="{MARGIN}" y1="{y}" x2="{width - MARGIN}" y2="{y}" stroke="#999" stroke-width="0.6"/>')
+    for measure in range(length + 1):
+        x = MARGIN + measure * MEASURE_WIDTH
+        parts.append(f'<line x1="{x}" y1="{MARGIN}" x2="{x}" y2="{height - MARGIN}" stroke="#ddd" stroke-width="0.6"/>')
+        if measure < length:
+            parts.append(f'<text x="{x + 2}" y="{height - MARGIN + 12}" fill="#666">{measure + 1}</text>')
+
+    for v, (voice_name, voice) in enumerate(midi_melodies.items()):
+        colour = VOICE_COLOURS[v % len(VOICE_COLOURS)]
+        for i, pitch in enumerate(voice):
+            if pitch is None:
+                continue
+            messages = flagged.get((voice_name, i + 1))
+            x = MARGIN + i * MEASURE_WIDTH + 3
+            y = y_of(pitch) - NOTE_HEIGHT / 2
+            tooltip = f"{voice_name} mm {i + 1}: {NOTE_NAMES[pitch % 12]}{pitch // 12 - 1} ({pitch})"
+            if messages:
+                tooltip += "\n" + "\n".join(messages)
+            parts.append(
+                f'<rect x="{x}" y="{y}" width="{MEASURE_WIDTH - 6}" height="{NOTE_HEIGHT}" rx="3" '
+                f'fill="{FLAG_COLOUR if messages else colour}" stroke="{colour}">'
+                f'<title>{escape(tooltip)}</title></rect>'
+            )
+        parts.append(f'<text x="{width - MARGIN + 3}" y="{MARGIN + 10 * (v + 1)}" fill="{colour}">{escape(voice_name)}</text>')
+
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def render_corpus(items, output_dir, key_root=60):
+    """
+    Write one SVG preview per score, for reviewing many results quickly.
+
+    Args:
+        items: Iterable of (name, midi_melodies) or (name, midi_melodies, findings).
+               Findings are computed with run_all_checks when not given.
+        output_dir: Directory for the <name>.svg files (created if missing).
+
+    Returns:
+        List of written file paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for item in items:
+        name, midi_melodies = item[0], item[1]
+        findings = item[2] if len(item) > 2 else None
+        if findings is None and "Counterpoint" in midi_melodies and "CantusFirmus" in midi_melodies:
+            findings = run_all_checks(midi_melodies["Counterpoint"], midi_melodies["CantusFirmus"], key_root=key_root)
+        path = os.path.join(output_dir, re.sub(r"[^\w.-]", "_", name) + ".svg")
+        with open(path, "w") as f:
+            f.write(render_svg(midi_melodies, findings, title=name))
+        written.append(path)
+    return written
+
+
+if __name__ == "__main__":
+    import glob
+
+    from corpus import read_lilypond_voices
+
+    ly_files = sorted(glob.glob(os.path.join("result", "*.ly")))
+    items = ((os.path.splitext(os.path.basename(path))[0], read_lilypond_voices(path)) for path in ly_files)
+    for path in render_corpus(items, os.path.join("result", "preview")):
+        print(f"Preview written: {path}")